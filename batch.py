@@ -0,0 +1,200 @@
+"""
+Headless batch solver
+Solve many maps with many strategies without opening a window (pygame is never imported).
+A collection file (.xsb, .sok) is expanded into one job per level, and its results carry the level number.
+Every (map, strategy) pair runs in its own worker process with a time limit and an optional memory limit, and one
+JSON line of results is written as soon as each pair finishes.
+The solver itself gives up at the limits and reports its partial statistics. The worker process is only killed as
+a backstop: a few seconds after the time limit, or by an address space limit of twice the memory limit.
+
+Usage:
+    python batch.py maps/ --strategies astar,greedy --heuristic matching --workers 4 --time-limit 60
+    python batch.py "maps/sokoban*.txt" --memory-limit 512 --output results.jsonl
+    python batch.py collections/microban.sok --strategies astar --time-limit 10
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+
+from modules.game_state import GameState
+from modules.map_loader import COLLECTION_EXTENSIONS, count_levels, is_collection, load_level, load_map
+from modules.solver import Solver
+
+KILL_GRACE = 5  # Seconds after the time limit before a worker that did not give up on its own is killed
+STOP_GRACE = 1  # Seconds a terminated worker has to stop its own processes before it is killed
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, the memory limit is then ignored
+    resource = None
+
+
+def find_maps(paths):
+    """Expand directories and glob patterns into a sorted list of map and collection files"""
+    map_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            patterns = ['*.txt'] + ['*' + extension for extension in COLLECTION_EXTENSIONS]
+            map_paths.extend(sorted(sum([glob.glob(os.path.join(path, pattern)) for pattern in patterns], [])))
+        else:
+            map_paths.extend(sorted(glob.glob(path)) or [path])
+    return map_paths
+
+
+def find_levels(paths):
+    """Expand the paths into a list of (map path, level number) pairs: one per level of a collection, and
+    (map path, None) for a map file"""
+    levels = []
+    for map_path in find_maps(paths):
+        if is_collection(map_path):
+            levels.extend((map_path, number) for number in range(count_levels(map_path)))
+        else:
+            levels.append((map_path, None))
+    return levels
+
+
+def load_game_map(map_path, number):
+    """Load a level of a collection, or a map file when number is None"""
+    return load_map(map_path) if number is None else load_level(map_path, number)
+
+
+def solve_job(job, map_path, number, strategy, heuristic, time_limit, memory_limit, results):
+    """Solve one level with one strategy in a worker process and send the result back"""
+    if memory_limit is not None and resource is not None:
+        limit = memory_limit * 2 * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    result = {}
+    start_time = time.time()
+    try:
+        solver = Solver(GameState(load_game_map(map_path, number)), strategy, heuristic, time_limit=time_limit,
+                        memory_limit=memory_limit)
+        solver.verbose = False
+        stats = solver.solve()
+        solution = solver.get_solution()
+        result.update({
+            'status': stats['status'],
+            'moves': len(solution) if solution is not None else None,
+            'solution': ''.join(solution) if solution is not None else None,
+            'expanded_states': solver.expanded_states,
+            'generated_states': solver.generated_states,
+        })
+    except MemoryError:
+        result['status'] = 'memory_limit'
+    except Exception as error:
+        result.update({'status': 'error', 'error': repr(error)})
+    result['runtime'] = round(time.time() - start_time, 4)
+    results.put((job, result))
+
+
+def exit_on_terminate(signum, frame):
+    sys.exit(1)
+
+
+def run_worker(target, *args):
+    """Run a job in a worker process. The workers are not daemonic, so that a job can start processes of its own
+    (the portfolio strategy does), and terminating one raises SystemExit, so that the job stops them first."""
+    signal.signal(signal.SIGTERM, exit_on_terminate)
+    target(*args)
+
+
+def stop_process(process):
+    """Terminate a worker and wait for it, killing it if it does not stop in time"""
+    process.terminate()
+    process.join(STOP_GRACE)
+    if process.is_alive():
+        process.kill()
+        process.join()
+
+
+def run_jobs(jobs, target, workers, time_limit):
+    """Run target(index, *args, results) in a worker process for every args tuple of jobs, at most `workers` at a
+    time. The target must put (index, result) in results. Yield (index, result) as the jobs finish; a job over the
+    time limit or that died without an answer yields a result with the status 'time_limit' or 'crashed'; an answer
+    it still sends after that is dropped."""
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    pending = list(enumerate(jobs))
+    running = {}  # Job index -> (process, start time)
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                index, args = pending.pop(0)
+                process = context.Process(target=run_worker, args=(target, index, *args, results))
+                process.start()
+                running[index] = (process, time.time())
+
+            try:
+                index, result = results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+            else:
+                job = running.pop(index, None)
+                if job is not None:
+                    job[0].join()
+                    yield index, result
+                continue  # Otherwise the job was already reported as over its time limit or crashed
+
+            # Stop the jobs over their time limit and report the ones that died without an answer
+            now = time.time()
+            for index, (process, start_time) in list(running.items()):
+                status = None
+                if time_limit is not None and now - start_time > time_limit:
+                    stop_process(process)
+                    status = 'time_limit'
+                elif process.exitcode not in (None, 0):
+                    process.join()
+                    status = 'crashed'
+                if status is not None:
+                    del running[index]
+                    yield index, {'status': status, 'runtime': round(now - start_time, 4)}
+    finally:
+        for process, _ in running.values():
+            stop_process(process)
+
+
+def run_batch(levels, strategies, heuristic, workers, time_limit, memory_limit, output):
+    """Run every (level, strategy) pair and write one JSON line per finished pair"""
+    jobs = [(map_path, number, strategy, heuristic, time_limit, memory_limit)
+            for map_path, number in levels for strategy in strategies]
+    kill_time = None if time_limit is None else time_limit + KILL_GRACE
+    for index, result in run_jobs(jobs, solve_job, workers, kill_time):
+        map_path, number, strategy = jobs[index][:3]
+        if result['status'] == 'crashed' and memory_limit is not None:
+            result['status'] = 'memory_limit'  # The worker was most likely killed for going over its memory
+        output.write(json.dumps({'map': map_path, 'level': number, 'strategy': strategy, 'heuristic': heuristic, **result}) + '\n')
+        output.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve Sokoban maps in bulk without a window.')
+    parser.add_argument('paths', nargs='+', help='map or collection files, directories of them, or glob patterns')
+    parser.add_argument('--strategies', default='astar', help='comma separated strategies (default: astar)')
+    parser.add_argument('--heuristic', default='matching', help='heuristic of the informed strategies')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='number of worker processes')
+    parser.add_argument('--time-limit', type=float, default=60, help='seconds per (map, strategy), 0 for none')
+    parser.add_argument('--memory-limit', type=int, default=None, help='megabytes per worker process')
+    parser.add_argument('--output', default=None, help='JSON lines file (default: standard output)')
+    args = parser.parse_args(argv)
+
+    levels = find_levels(args.paths)
+    strategies = [strategy.strip() for strategy in args.strategies.split(',') if strategy.strip()]
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        run_batch(levels, strategies, args.heuristic, max(1, args.workers), args.time_limit or None,
+                  args.memory_limit, output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""
+Reproducible benchmark of the solver strategies and heuristics
+Every strategy is run on every map of the maps directory and on a set of generated levels (seeded, so they are the
+same on every run). Each (level, strategy, heuristic) runs in its own process: a few warm-up runs, then repeated
+measured runs. The benchmark records expanded and generated nodes, nodes per second, peak RSS and solution length
+and writes them to a JSON file.
+
+Given a baseline file (written earlier with --save-baseline), the results are compared against it and the
+benchmark exits with status 1 on any regression: a level that is no longer solved, more expanded nodes, a longer
+solution, a runtime or peak memory over the tolerance, or a baseline entry missing from the run. Levels are
+compared by file name, so a map given by a relative or an absolute path is the same level; every level of a
+collection (.xsb, .sok) is benchmarked, named after the file and its level number.
+
+Usage:
+    python benchmark.py --save-baseline benchmarks/baseline.json
+    python benchmark.py --baseline benchmarks/baseline.json --strategies astar,greedy --heuristics matching
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from batch import find_levels, load_game_map, run_jobs
+from modules.game_state import GameState
+from modules.heuristics import HEURISTICS
+from modules.instrumentation import get_peak_rss_kb
+from modules.level_generator import generate_level
+from modules.solver import INFORMED_STRATEGIES, STRATEGIES, Solver
+
+
+def benchmark_job(index, game_map, strategy, heuristic, warmup, repeats, results):
+    """Run one (level, strategy, heuristic) several times in a worker process and send the measures back"""
+    runtimes = []
+    try:
+        for run in range(warmup + repeats):
+            solver = Solver(GameState([line[:] for line in game_map]), strategy, heuristic)
+            solver.verbose = False
+            start_time = time.perf_counter()
+            stats = solver.solve()
+            if run >= warmup:
+                runtimes.append(time.perf_counter() - start_time)
+    except Exception as error:
+        results.put((index, {'status': 'error', 'error': repr(error)}))
+        return
+
+    solution = solver.get_solution()
+    runtime = statistics.median(runtimes)
+    results.put((index, {
+        'status': stats['status'],
+        'moves': len(solution) if solution is not None else None,
+        'expanded_states': solver.expanded_states,
+        'generated_states': solver.generated_states,
+        'runtime': round(runtime, 6),
+        'runtimes': [round(value, 6) for value in runtimes],
+        'nodes_per_second': round(solver.expanded_states / runtime, 1) if runtime > 0 else None,
+        'peak_rss_kb': get_peak_rss_kb(),
+    }))
+
+
+def get_levels(map_levels, generated):
+    """Get the (name, map) of every level to benchmark. A level of a collection is named '<file name>#<number>'."""
+    levels = []
+    for map_path, number in map_levels:
+        name = get_level_name(map_path) if number is None else '{}#{}'.format(get_level_name(map_path), number)
+        levels.append((name, load_game_map(map_path, number)))
+    names = [name for name, _ in levels]
+    if len(set(names)) != len(names):
+        raise Exception('Invalid maps: two maps have the same file name')
+    for seed in range(generated):
+        levels.append(('generated/{}'.format(seed), generate_level(seed, boxes=3 + seed % 3, steps=1000)))
+    return levels
+
+
+def get_level_name(level):
+    """Name a level the same way whatever path it was given with: the file name of a map, or 'generated/<seed>'"""
+    if level.startswith('generated/'):
+        return level
+    return os.path.basename(os.path.normpath(level))
+
+
+def get_key(result):
+    return '{}|{}|{}'.format(get_level_name(result['level']), result['strategy'], result['heuristic'])
+
+
+def find_regressions(results, baseline, node_tolerance, time_tolerance, memory_tolerance, min_runtime):
+    """Compare the results against the baseline results. Return the regressions, including every baseline entry
+    without a result in this run, and the keys of the results that have no baseline entry."""
+    previous_results = {get_key(result): result for result in baseline['results']}
+    current_keys = {get_key(result) for result in results}
+    regressions = ['{}: missing from this run'.format(key) for key in previous_results if key not in current_keys]
+    unmatched = []
+    for result in results:
+        name = get_key(result)
+        previous = previous_results.get(name)
+        if previous is None:
+            unmatched.append(name)
+            continue
+        if previous['status'] != 'solved':
+            continue
+        if result['status'] != 'solved':
+            regressions.append('{}: {} (was solved)'.format(name, result['status']))
+            continue
+        if result['expanded_states'] > previous['expanded_states'] * (1 + node_tolerance):
+            regressions.append('{}: expanded nodes {} -> {}'.format(
+                name, previous['expanded_states'], result['expanded_states']))
+        if result['moves'] > previous['moves']:
+            regressions.append('{}: solution length {} -> {}'.format(name, previous['moves'], result['moves']))
+        if (result['runtime'] > min_runtime
+                and result['runtime'] > previous['runtime'] * (1 + time_tolerance)):
+            regressions.append('{}: runtime {:.4f}s -> {:.4f}s'.format(name, previous['runtime'], result['runtime']))
+        if (result.get('peak_rss_kb') and previous.get('peak_rss_kb')
+                and result['peak_rss_kb'] > previous['peak_rss_kb'] * (1 + memory_tolerance)):
+            regressions.append('{}: peak RSS {} KB -> {} KB'.format(
+                name, previous['peak_rss_kb'], result['peak_rss_kb']))
+    return regressions, unmatched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the solver strategies and heuristics.')
+    parser.add_argument('--maps', nargs='*', default=['maps'], help='map files, directories or glob patterns')
+    parser.add_argument('--generated', type=int, default=5, help='number of generated levels')
+    parser.add_argument('--strategies', default=','.join(s for s in STRATEGIES if s != 'portfolio'),
+                        help='comma separated strategies')
+    parser.add_argument('--heuristics', default=','.join(HEURISTICS),
+                        help='comma separated heuristics, only used by the informed strategies')
+    parser.add_argument('--warmup', type=int, default=1, help='unmeasured runs before the measured ones')
+    parser.add_argument('--repeats', type=int, default=3, help='measured runs, the median runtime is kept')
+    parser.add_argument('--time-limit', type=float, default=60, help='seconds per (level, strategy, heuristic)')
+    parser.add_argument('--output', default='bench_output.json', help='JSON file of the results')
+    parser.add_argument('--baseline', default=None, help='JSON results to compare against')
+    parser.add_argument('--save-baseline', default=None, help='also write the results to this baseline file')
+    parser.add_argument('--node-tolerance', type=float, default=0.10, help='allowed increase of expanded nodes')
+    parser.add_argument('--time-tolerance', type=float, default=0.50, help='allowed increase of the runtime')
+    parser.add_argument('--memory-tolerance', type=float, default=0.25, help='allowed increase of the peak RSS')
+    parser.add_argument('--min-runtime', type=float, default=0.05,
+                        help='runtimes below this many seconds are too noisy to be compared')
+    args = parser.parse_args(argv)
+
+    strategies = [strategy.strip() for strategy in args.strategies.split(',') if strategy.strip()]
+    heuristics = [heuristic.strip() for heuristic in args.heuristics.split(',') if heuristic.strip()]
+    levels = get_levels(find_levels(args.maps), args.generated)
+
+    jobs = []
+    names = []
+    for level_name, game_map in levels:
+        for strategy in strategies:
+            for heuristic in (heuristics if strategy in INFORMED_STRATEGIES else heuristics[:1]):
+                jobs.append((game_map, strategy, heuristic, args.warmup, args.repeats))
+                names.append((level_name, strategy, heuristic if strategy in INFORMED_STRATEGIES else None))
+
+    # One job at a time, so that the measured runs do not compete for the CPU
+    results = []
+    for index, result in run_jobs(jobs, benchmark_job, 1, args.time_limit):
+        level_name, strategy, heuristic = names[index]
+        result = {'level': level_name, 'strategy': strategy, 'heuristic': heuristic, **result}
+        results.append(result)
+        print('{:<32} {:<8} {:<14} {:<12} expanded={:<8} {:>10} nodes/s  {:.4f}s'.format(
+            level_name, strategy, heuristic or '-', result['status'], result.get('expanded_states', '-'),
+            result.get('nodes_per_second') or '-', result.get('runtime', 0)), flush=True)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'warmup': args.warmup,
+        'repeats': args.repeats,
+        'results': results,
+    }
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions, unmatched = find_regressions(results, baseline, args.node_tolerance, args.time_tolerance,
+                                                  args.memory_tolerance, args.min_runtime)
+        for key in unmatched:
+            print('{}: not in the baseline, not compared'.format(key))
+        if regressions:
+            print('\nPERFORMANCE REGRESSIONS against {}:'.format(args.baseline))
+            for regression in regressions:
+                print('  ' + regression)
+            sys.exit(1)
+        print('\nNo regression against {}'.format(args.baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,49 +1,146 @@
+import argparse
 import pygame
 import sys
 from pygame.locals import QUIT
 import os
 from modules.game_state import GameState
 from modules.game_visualization import GameVisualization
-from modules.solver import Solver
+from modules.solver import STRATEGIES, Solver
+from modules.map_loader import load_map
+from modules.rendering import SpriteAtlas, get_cell_size, render_map
+from modules.solution_cache import SolutionCache
 import threading
 import time
 
-def load_map(map_path):
-    """Load the map from the given path"""
-    with open(map_path, 'r') as f:
-        game_map = [list(line.strip()) for line in f]
-    return game_map
-
 WHITE = (255, 255, 255)
+MAP_CACHE = {}  # Map path -> parsed map
+
+
+class BackgroundSolver:
+    """Run a Solver in a daemon thread so that the window keeps handling its events during the search.
+    With a solution cache, a cached answer is returned at once and a new answer is stored."""
+
+    def __init__(self, game_map, strategy, cache=None):
+        self.game_map = game_map
+        self.strategy = strategy
+        self.cache = cache
+        self.cancel_token = threading.Event()
+        self.solver = Solver(GameState([row[:] for row in game_map]), strategy, cancel_token=self.cancel_token)
+        self.config = {'memory_budget': self.solver.memory_budget, 'macros': self.solver.macros is not None}
+        self.solution = None
+        self.stats = None
+        self.error = None
+        self.start_time = time.time()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            solver = self.solver
+            if self.cache is not None:
+                cached = self.cache.get(self.game_map, self.strategy, solver.heuristic_name, self.config)
+                if cached is not None:
+                    print("Solution found in the cache")
+                    self.solution, self.stats = cached
+                    return
+            self.stats = solver.solve()
+            self.solution = solver.get_solution()
+            if self.cache is not None:
+                self.cache.put(self.game_map, self.strategy, solver.heuristic_name, self.solution, self.stats,
+                               self.config)
+        except Exception as error:
+            self.error = error
+
+    def is_done(self):
+        return not self.thread.is_alive()
+
+    def cancel(self):
+        """Ask the search to stop; it gives up at its next limit check"""
+        self.cancel_token.set()
+
+
+def solve_in_background(game_map, selected_strategy, cache=None):
+    """Solve the map in a background thread while showing the live progress at 60 FPS.
+    Up and down switch to another strategy and restart the search, Escape aborts it.
+    Return the strategy and the solution, or None if the search was aborted."""
+    options = STRATEGIES
+    screen = pygame.display.get_surface()
+    font = pygame.font.SysFont('Arial', 20)
+    clock = pygame.time.Clock()
+    background = BackgroundSolver(game_map, selected_strategy, cache)
+
+    while not background.is_done():
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                background.cancel()
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    background.cancel()
+                    return None
+                if event.key in (pygame.K_UP, pygame.K_DOWN):
+                    step = -1 if event.key == pygame.K_UP else 1
+                    selected_strategy = options[(options.index(selected_strategy) + step) % len(options)]
+                    background.cancel()
+                    background = BackgroundSolver(game_map, selected_strategy, cache)
+
+        solver = background.solver
+        lines = [
+            "Solving with {}...".format(background.strategy),
+            "Elapsed time: {:.1f} seconds".format(time.time() - background.start_time),
+            "Expanded nodes: {}".format(solver.expanded_states),
+            "Generated nodes: {}".format(solver.generated_states),
+            "",
+            "Use arrow up and down to switch strategy.",
+            "Press Escape to abort.",
+        ]
+        screen.fill((0, 0, 0))
+        for idx, line in enumerate(lines):
+            screen.blit(font.render(line, True, WHITE), (10, 10 + idx * (font.get_height() + 10)))
+        pygame.display.flip()
+        clock.tick(60)
 
-def select_strategy():
-    options = ['bfs', 'dfs', 'astar', 'ucs', 'greedy', 'custom']
-    selected_strategy = options[0]  # Default selected strategy
+    if background.error is not None:
+        print("Solver error:", repr(background.error))
+        return background.strategy, None
+    return background.strategy, background.solution
+
+
+def get_map(map_path):
+    """Load a map once and keep it parsed for the next calls"""
+    if map_path not in MAP_CACHE:
+        MAP_CACHE[map_path] = load_map(map_path)
+    return MAP_CACHE[map_path]
+
+
+def select_strategy(selected_strategy=None, map_index=0):
+    options = STRATEGIES
+    selected_strategy = selected_strategy or options[0]  # Default selected strategy
 
     pygame.init()
     screen_width = 1400
     screen_height = 800
     screen = pygame.display.set_mode((screen_width, screen_height))
     font = pygame.font.SysFont('Arial', 20)
+    clock = pygame.time.Clock()
 
     instructions = [
         "Use arrow left and right to select a map.",
         "Use arrow up and down to choose strategy.",
         "Press Enter to select."
     ]
+    instruction_margin = 10
+    instruction_texts = [font.render(instruction, True, WHITE) for instruction in instructions]
 
-    # Load image assets
-    wall_image = pygame.image.load(os.path.join('assets', 'wall.png'))
-    box_image = pygame.image.load(os.path.join('assets', 'box.png'))
-    target_image = pygame.image.load(os.path.join('assets', 'target.png'))
-    player_image = pygame.image.load(os.path.join('assets', 'player_up.png'))
-    floor_image = pygame.image.load(os.path.join('assets', 'floor.png'))
-    box_on_target_image = pygame.image.load(os.path.join('assets', 'crate_10.png'))
+    # Sprites are scaled once per cell size and every map preview is drawn once into its own surface
+    atlas = SpriteAtlas()
+    previews = {}  # Map path -> pre-rendered preview surface
+    map_area = (screen_width - 2 * 340, screen_height - 2 * 80)  # Leave room for the texts
     start_time = None
 
     map_paths = ["maps/sokoban1.txt", "maps/sokoban2.txt" , "maps/sokoban3.txt", "maps/sokoban4.txt" , "maps/sokoban_extra3.txt" , "maps/sokoban_extra2.txt"]  # List of available map paths
-    map_index = 0  # Index of the currently selected map
-    game_map = load_map(map_paths[map_index])  # Initialize game_map
+    game_map = get_map(map_paths[map_index])  # Initialize game_map
 
     while True:
         for event in pygame.event.get():
@@ -57,83 +154,31 @@ def select_strategy():
                     selected_strategy = options[(options.index(selected_strategy) + 1) % len(options)]
                 elif event.key == pygame.K_LEFT:
                     map_index = (map_index - 1) % len(map_paths)
-                    game_map = load_map(map_paths[map_index])
+                    game_map = get_map(map_paths[map_index])
                 elif event.key == pygame.K_RIGHT:
                     map_index = (map_index + 1) % len(map_paths)
-                    game_map = load_map(map_paths[map_index])
+                    game_map = get_map(map_paths[map_index])
                 elif event.key == pygame.K_RETURN:
                     start_time = time.time()  # Start the timer
-                    return selected_strategy, game_map, start_time
+                    return selected_strategy, map_index, [row[:] for row in game_map], start_time
+
+        preview = previews.get(map_paths[map_index])
+        if preview is None:
+            cell_size = get_cell_size(game_map, *map_area)
+            preview = render_map(game_map, atlas, cell_size)
+            previews[map_paths[map_index]] = preview
 
-        # Clear the screen
+        # Clear the screen and draw the map preview in the middle
         screen.fill((0, 0, 0))
+        screen.blit(preview, preview.get_rect(center=(screen_width // 2, screen_height // 2)))
 
         # Render instructions
-        instruction_margin = 10
         instruction_offset_x = screen_width - instruction_margin
         instruction_offset_y = screen_height // 2 - (len(instructions) * font.get_height()) // 2
-        for idx, instruction in enumerate(instructions):
-            instruction_text = font.render(instruction, True, (255, 255, 255))
+        for idx, instruction_text in enumerate(instruction_texts):
             instruction_rect = instruction_text.get_rect(topright=(instruction_offset_x, instruction_offset_y + idx * (instruction_text.get_height() + instruction_margin)))
             screen.blit(instruction_text, instruction_rect)
 
-        # Map rendering
-        cell_size = 65  # Adjust cell size as needed
-        if map_paths[map_index] == "maps/sokoban_extra3.txt":
-            cell_size = 48  # Reduce cell size for "sokoban_extra1" map
-        map_width = len(game_map[0]) * cell_size
-        map_height = len(game_map) * cell_size
-        map_offset_x = (screen_width - map_width) // 2
-        map_offset_y = (screen_height - map_height) // 2
-
-        for row in range(len(game_map)):
-            for col in range(len(game_map[row])):
-                x = map_offset_x + col * cell_size
-                y = map_offset_y + row * cell_size
-                if game_map[row][col] == '#':
-                    # Resize wall image to 48x48 if the map is "sokoban_extra1"
-                    if map_paths[map_index] == "maps/sokoban_extra3.txt":
-                        resized_wall_image = pygame.transform.scale(wall_image, (48, 48))
-                        screen.blit(resized_wall_image, (x, y))
-                    else:
-                        screen.blit(wall_image, (x, y))
-                elif game_map[row][col] == '$':
-                    # Resize box image to 48x48 if the map is "sokoban_extra1"
-                    if map_paths[map_index] == "maps/sokoban_extra3.txt":
-                        resized_box_image = pygame.transform.scale(box_image, (48, 48))
-                        screen.blit(resized_box_image, (x, y))
-                    else:
-                        screen.blit(box_image, (x, y))
-                elif game_map[row][col] == '.':
-                    # Resize target image to 48x48 if the map is "sokoban_extra1"
-                    if map_paths[map_index] == "maps/sokoban_extra3.txt":
-                        resized_target_image = pygame.transform.scale(target_image, (48, 48))
-                        screen.blit(resized_target_image, (x, y))
-                    else:
-                        screen.blit(target_image, (x, y))
-                elif game_map[row][col] == '*':
-                    # Resize box on target image to 48x48 if the map is "sokoban_extra1"
-                    if map_paths[map_index] == "maps/sokoban_extra3.txt":
-                        resized_box_on_target_image = pygame.transform.scale(box_on_target_image, (48, 48))
-                        screen.blit(resized_box_on_target_image , (x, y))
-                    else:
-                        screen.blit(box_on_target_image , (x, y))
-                else:
-                    # Resize floor image to 48x48 if the map is "sokoban_extra1"
-                    if map_paths[map_index] == "maps/sokoban_extra3.txt":
-                        resized_floor_image = pygame.transform.scale(floor_image, (48, 48))
-                        screen.blit(resized_floor_image, (x, y))
-                    else:
-                        screen.blit(floor_image, (x, y))
-                    # Then draw other elements
-                    if game_map[row][col] == '@':
-                        # Resize player image to 48x48 if the map is "sokoban_extra1"
-                        if map_paths[map_index] == "maps/sokoban_extra3.txt":
-                            resized_player_image = pygame.transform.scale(player_image, (48, 48))
-                            screen.blit(resized_player_image, (x, y))
-                        else:
-                            screen.blit(player_image, (x, y))
-
         # Display selected strategy and map at the top left
         selected_strategy_text = font.render(f"Selected Strategy: {selected_strategy}", True, (255, 255, 255))
         screen.blit(selected_strategy_text, (instruction_margin, instruction_margin))
@@ -141,17 +186,28 @@ def select_strategy():
         screen.blit(map_name_text, (instruction_margin, instruction_margin + selected_strategy_text.get_height() + instruction_margin))
 
         pygame.display.flip()  # Update the display after drawing the map and text
+        clock.tick(60)
 
 if __name__ == '__main__':
-    selected_strategy, game_map, start_time = select_strategy()
-    print("Selected strategy:", selected_strategy)
+    parser = argparse.ArgumentParser(description='Solve a Sokoban map and play the solution back.')
+    parser.add_argument('--no-cache', action='store_true', help='always solve, without reading or writing the cache')
+    parser.add_argument('--clear-cache', action='store_true', help='delete every cached solution first')
+    args = parser.parse_args()
 
-    game_state = GameState(game_map)
+    cache = None if args.no_cache else SolutionCache()
+    if args.clear_cache:
+        (cache or SolutionCache()).clear()
 
-    solver = Solver(game_state, selected_strategy)
-    solver.solve()
-    solution = solver.get_solution()
+    selected_strategy, map_index = None, 0
+    while True:
+        selected_strategy, map_index, game_map, start_time = select_strategy(selected_strategy, map_index)
+        print("Selected strategy:", selected_strategy)
+        result = solve_in_background(game_map, selected_strategy, cache)
+        if result is not None:
+            break  # Otherwise the search was aborted, go back to the selection
+    selected_strategy, solution = result
 
+    game_state = GameState(game_map)
     game_visualization = GameVisualization(game_state, solution)
 
     pygame.init()
@@ -0,0 +1,227 @@
+"""
+Bitboard level backend
+An alternative to GameState and SearchNode where every set of cells is a Python integer used as a bit mask.
+The map is padded with one column and one row of walls on every side, and cell (row, col) is bit
+(row + 1) * stride + (col + 1), with stride = width + 2. With the padding, moving a whole set of cells one step is
+one shift (up: >> stride, down: << stride, left: >> 1, right: << 1) that can never wrap to another row.
+- BitLayout: the static masks of a level (walls, floor, targets, dead squares), built once per level.
+- BitState: the player bit index and the box mask. A pushed state keeps its parent and the push that led to it, so
+  the solver can run its uninformed strategies on this backend (Solver(backend='bitboard')).
+The player region is a flood fill of shifts and masks, the legal pushes of one direction are found for every box
+at once, the solved check is a mask comparison and key() is a pair of ints.
+move() follows the semantics of GameState.move: a step onto an empty cell or a target, or a push of a box onto an
+empty cell or a target, costs 1; any other move leaves the state unchanged.
+"""
+
+from modules.deadlock import find_dead_squares
+
+DIRECTIONS = ['U', 'D', 'L', 'R']
+OPPOSITE = {'U': 'D', 'D': 'U', 'L': 'R', 'R': 'L'}
+
+
+class BitLayout:
+    def __init__(self, game_map):
+        self.height = len(game_map)
+        self.width = max((len(line) for line in game_map), default=0)
+        self.stride = self.width + 2
+        self.walls = 0
+        self.floor = 0
+        self.targets = 0
+        for row, line in enumerate(game_map):
+            for col, char in enumerate(line):
+                bit = 1 << self.get_index((row, col))
+                if char == '#':
+                    self.walls |= bit
+                else:
+                    self.floor |= bit
+                if char in ['.', '*', '+']:
+                    self.targets |= bit
+        self.steps = {'U': -self.stride, 'D': self.stride, 'L': -1, 'R': 1}  # Bit index change of every direction
+
+        # Dead squares are found on cell positions once, then turned into a mask
+        floor_cells = set(self.get_positions(self.floor))
+        target_cells = set(self.get_positions(self.targets))
+        self.dead_squares = self.get_mask(find_dead_squares(floor_cells, target_cells))
+        self.live = self.floor & ~self.dead_squares
+
+    def get_index(self, position):
+        row, col = position
+        return (row + 1) * self.stride + col + 1
+
+    def get_position(self, index):
+        row, col = divmod(index, self.stride)
+        return row - 1, col - 1
+
+    def get_mask(self, positions):
+        mask = 0
+        for position in positions:
+            mask |= 1 << self.get_index(position)
+        return mask
+
+    def get_positions(self, mask):
+        """Get the (row, column) of every bit of the mask, in increasing bit order"""
+        positions = []
+        while mask:
+            low = mask & -mask
+            positions.append(self.get_position(low.bit_length() - 1))
+            mask ^= low
+        return positions
+
+    def shift(self, mask, direction):
+        """Move every cell of the mask one step in the direction"""
+        step = self.steps[direction]
+        return mask << step if step > 0 else mask >> -step
+
+
+class BitState:
+    __slots__ = ('layout', 'player', 'boxes', 'current_cost', 'region', 'parent', 'last_push')
+
+    def __init__(self, layout, player, boxes, current_cost=0, parent=None, last_push=None):
+        self.layout = layout
+        self.player = player  # Bit index of the player
+        self.boxes = boxes  # Mask of the boxes
+        self.current_cost = current_cost
+        self.region = None  # Mask of the cells the player can reach, computed lazily by get_region()
+        self.parent = parent  # State this one was pushed from
+        self.last_push = last_push  # The (box bit index, direction) push that led from the parent to this state
+
+    @classmethod
+    def from_map(cls, game_map, layout=None):
+        if layout is None:
+            layout = BitLayout(game_map)
+        player = None
+        boxes = 0
+        for row, line in enumerate(game_map):
+            for col, char in enumerate(line):
+                if char in ['@', '+']:
+                    player = layout.get_index((row, col))
+                elif char in ['$', '*']:
+                    boxes |= 1 << layout.get_index((row, col))
+        return cls(layout, player, boxes)
+
+    @classmethod
+    def from_state(cls, state, layout=None):
+        """Build a bitboard state from a GameState"""
+        return cls.from_map(state.map, layout)
+
+    def to_map(self):
+        """Draw the state with the characters of GameState"""
+        layout = self.layout
+        game_map = []
+        for row in range(layout.height):
+            line = []
+            for col in range(layout.width):
+                bit = 1 << layout.get_index((row, col))
+                if layout.walls & bit:
+                    char = '#'
+                elif self.boxes & bit:
+                    char = '*' if layout.targets & bit else '$'
+                elif 1 << self.player == bit:
+                    char = '+' if layout.targets & bit else '@'
+                else:
+                    char = '.' if layout.targets & bit else ' '
+                line.append(char)
+            game_map.append(line)
+        return game_map
+
+    def key(self):
+        """Return the identity of the state: the box mask and the lowest cell of the player region"""
+        region = self.get_region()
+        return self.boxes, region & -region
+
+    def hash(self):
+        """Hash the key, for the transposition table of the solver"""
+        return hash(self.key())
+
+    def __hash__(self):
+        return self.hash()
+
+    def __eq__(self, other):
+        return isinstance(other, BitState) and self.key() == other.key()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # The following methods are used to check if a position is a wall, box, target, or empty space
+    # The position is a tuple (row, column)
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def is_wall(self, position):
+        """Check if the given position is a wall"""
+        return not self.layout.floor >> self.layout.get_index(position) & 1
+
+    def is_box(self, position):
+        """Check if the given position is a box"""
+        return bool(self.boxes >> self.layout.get_index(position) & 1)
+
+    def is_target(self, position):
+        """Check if the given position is a target"""
+        return bool(self.layout.targets >> self.layout.get_index(position) & 1)
+
+    def is_empty(self, position):
+        """Check if a position is empty or a target."""
+        return bool((self.layout.floor & ~self.boxes) >> self.layout.get_index(position) & 1)
+
+    def get_current_cost(self):
+        return self.current_cost
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # The following methods generate the next states with shifts and masks
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def get_region(self):
+        """Flood-fill the cells the player can reach without pushing a box, all directions at once"""
+        if self.region is None:
+            stride = self.layout.stride
+            free = self.layout.floor & ~self.boxes
+            region = 1 << self.player
+            while True:
+                grown = (region | region << 1 | region >> 1 | region << stride | region >> stride) & free
+                if grown == region:
+                    break
+                region = grown
+            self.region = region
+        return self.region
+
+    def move(self, direction):
+        """Generate the next state by moving the player in the given direction, like GameState.move"""
+        layout = self.layout
+        step = layout.steps[direction]
+        new_player = self.player + step
+        bit = 1 << new_player
+        free = layout.floor & ~self.boxes
+        if free & bit:
+            return BitState(layout, new_player, self.boxes, self.current_cost + 1)
+        if self.boxes & bit and free & 1 << (new_player + step):
+            boxes = self.boxes ^ bit ^ 1 << (new_player + step)
+            return BitState(layout, new_player, boxes, self.current_cost + 1)
+        return self
+
+    def get_push_masks(self):
+        """Get, for every direction, the mask of the boxes that can be pushed that way onto a live empty cell"""
+        layout = self.layout
+        region = self.get_region()
+        landing = layout.live & ~self.boxes
+        masks = {}
+        for direction in DIRECTIONS:
+            # The player stands behind the box and the cell after the box is free
+            masks[direction] = self.boxes & layout.shift(region, direction) & layout.shift(landing, OPPOSITE[direction])
+        return masks
+
+    def get_pushes(self):
+        """Get every legal push onto a live cell as a (box bit index, direction) pair"""
+        pushes = []
+        for direction, mask in self.get_push_masks().items():
+            while mask:
+                low = mask & -mask
+                pushes.append((low.bit_length() - 1, direction))
+                mask ^= low
+        return pushes
+
+    def push(self, box, direction):
+        """Generate the next state by pushing the box at the bit index in the direction; the push costs 1"""
+        new_box = box + self.layout.steps[direction]
+        return BitState(self.layout, box, self.boxes ^ (1 << box) ^ (1 << new_box), self.current_cost + 1,
+                        self, (box, direction))
+
+    def check_solved(self):
+        """Check if the game is solved: with as many boxes as targets, boxes == targets"""
+        return self.boxes & ~self.layout.targets == 0
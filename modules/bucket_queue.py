@@ -0,0 +1,87 @@
+"""
+Bucket priority queue for the open lists of the informed strategies
+The costs of the open lists are small non-negative integers (pushes, plus an integer heuristic), so instead of a
+binary heap of (cost, node) tuples the queue keeps one bucket per cost and a pointer to the lowest bucket that may
+hold a node. Push appends to a bucket and pop takes from the lowest non-empty one, both in O(1) amortized time, and
+every entry is a single node reference, with no tuple and no comparison between nodes.
+
+Ties inside a bucket:
+- tie_breaking='h': the bucket of a cost is split by cost - g, the heuristic of an A* entry, and the lowest one is
+  popped first. For a given f = g + h, a lower h is the same as a higher g: the node closest to a goal first.
+- otherwise the bucket is a stack, so the newest node, usually the deepest one, is popped first.
+Duplicates are removed lazily: an entry whose node was reached again with a lower cost stays in its bucket and is
+dropped by the stale check of the strategy when it is popped.
+
+BucketQueue.push(queue, entry) and BucketQueue.pop(queue) have the signatures of heapq.heappush and heapq.heappop,
+so the Solver uses either one as its frontier operations (Solver(frontier='bucket')).
+"""
+
+
+class BucketQueue:
+    def __init__(self, tie_breaking=None):
+        self.tie_breaking = tie_breaking
+        self.buckets = []  # buckets[cost][tie] is a stack of nodes
+        self.counts = []  # Number of nodes of every cost
+        self.lowest_ties = []  # No stack of buckets[cost] below this tie holds a node
+        self.lowest = 0  # No bucket below this cost holds a node
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, entry):
+        """Add a (cost, node) entry"""
+        cost, node = entry
+        index = int(cost)
+        if index != cost or index < 0:
+            raise Exception('Invalid cost for a bucket queue: ' + repr(cost))
+        tie = index - node.get_current_cost() if self.tie_breaking == 'h' else 0
+        if tie < 0:
+            raise Exception('Invalid cost for a bucket queue: lower than the cost of the node')
+
+        while len(self.buckets) <= index:
+            self.buckets.append([])
+            self.counts.append(0)
+            self.lowest_ties.append(0)
+        bucket = self.buckets[index]
+        while len(bucket) <= tie:
+            bucket.append([])
+        bucket[tie].append(node)
+
+        self.counts[index] += 1
+        if tie < self.lowest_ties[index]:
+            self.lowest_ties[index] = tie
+        if index < self.lowest:
+            self.lowest = index  # Only with an inconsistent heuristic
+        self.size += 1
+
+    def find_lowest(self):
+        """Move the pointers to the lowest non-empty bucket and stack and return their indices"""
+        if not self.size:
+            raise IndexError('bucket queue is empty')
+        counts = self.counts
+        while not counts[self.lowest]:
+            self.lowest += 1
+        index = self.lowest
+        bucket = self.buckets[index]
+        tie = self.lowest_ties[index]
+        while not bucket[tie]:
+            tie += 1
+        self.lowest_ties[index] = tie
+        return index, tie
+
+    def peek(self):
+        """Get the (cost, node) entry that pop() would return, without removing it"""
+        index, tie = self.find_lowest()
+        return index, self.buckets[index][tie][-1]
+
+    def pop(self):
+        """Remove and return the (cost, node) entry of lowest cost"""
+        index, tie = self.find_lowest()
+        node = self.buckets[index][tie].pop()
+        self.counts[index] -= 1
+        self.size -= 1
+        if not self.counts[index]:
+            self.buckets[index] = []  # Release the emptied stacks of the bucket
+            self.lowest_ties[index] = 0
+        return index, node
@@ -0,0 +1,72 @@
+"""
+Deadlock detection for the solver
+A deadlock is a position from which the level can no longer be solved. Two kinds are detected:
+- Dead squares: static cells from which a box can never reach a target, whatever the other boxes do.
+  They only depend on the walls and targets, so they are computed once per level by find_dead_squares().
+- Freeze deadlocks: a box that can move neither horizontally nor vertically, because of walls, dead squares and
+  other frozen boxes (this includes 2x2 blocks of boxes and walls), while it is not on a target.
+  They depend on the box positions and are checked after every push by is_freeze_deadlock().
+The positions are tuples (row, column).
+"""
+
+AXES = [(1, 0), (0, 1)]  # Vertical and horizontal axis
+
+
+def find_dead_squares(floor, targets):
+    """Find every floor cell from which a box can never be pushed to a target.
+    A box can be pulled from cell c to c + d when c + d and c + 2d are floor (the player walks backwards), so the
+    live cells are the ones reached by pulling boxes away from every target."""
+    live = set(targets)
+    stack = list(targets)
+    while stack:
+        row, col = stack.pop()
+        for d_row, d_col in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+            box = (row + d_row, col + d_col)
+            player = (row + 2 * d_row, col + 2 * d_col)
+            if box not in live and box in floor and player in floor:
+                live.add(box)
+                stack.append(box)
+    return frozenset(floor) - live
+
+
+def _is_blocked(layout, boxes, box, axis, assumed_walls):
+    """Check if a box cannot move along an axis.
+    The boxes in assumed_walls are treated as walls, which stops the recursion on cycles of boxes."""
+    d_row, d_col = axis
+    before = (box[0] - d_row, box[1] - d_col)
+    after = (box[0] + d_row, box[1] + d_col)
+
+    if before not in layout.floor or after not in layout.floor:
+        return True
+    if before in layout.dead_squares and after in layout.dead_squares:
+        return True
+
+    assumed_walls = assumed_walls | {box}
+    other_axis = (d_col, d_row)
+    for neighbor in (before, after):
+        if neighbor in assumed_walls:
+            return True
+        if neighbor in boxes and _is_blocked(layout, boxes, neighbor, other_axis, assumed_walls):
+            return True
+    return False
+
+
+def is_frozen(layout, boxes, box):
+    """Check if a box can move neither vertically nor horizontally"""
+    return all(_is_blocked(layout, boxes, box, axis, frozenset()) for axis in AXES)
+
+
+def is_freeze_deadlock(layout, boxes, box):
+    """Check if the box that was just pushed froze itself, or one of its neighbours, outside a target"""
+    if not is_frozen(layout, boxes, box):
+        return False
+    if box not in layout.targets:
+        return True
+
+    # The box sits on a target, but it may have frozen a neighbouring box that does not
+    row, col = box
+    for d_row, d_col in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+        neighbor = (row + d_row, col + d_col)
+        if neighbor in boxes and neighbor not in layout.targets and is_frozen(layout, boxes, neighbor):
+            return True
+    return False
@@ -0,0 +1,210 @@
+"""
+External-memory breadth-first search
+Solver(strategy='bfs', external_memory=True) searches one layer of pushes at a time and keeps the layers on disk
+instead of in a deque and a visited table:
+- A node is stored as a fixed-size record of packed cell indices (see KeyCodec): the canonical player cell followed
+  by the sorted box cells. The records are big-endian, so sorting them as bytes sorts them as keys.
+- Layer d is a sorted file of records. It is read back as a stream, every record is turned into a node again and
+  expanded. The successors are collected in a set of at most buffer_size records; a full set is sorted and written
+  as a run file.
+- At the end of the layer the runs are merged into one sorted stream, in which duplicates are next to each other.
+  That stream is merged against the sorted union of every earlier layer (the closed file): the records found there
+  are dropped, the others form layer d + 1, and the closed file is rewritten with them in the same pass.
+The memory used is the buffer plus one record per file being merged, whatever the size of the search.
+
+Only node keys are stored, never parents. When a successor is solved, the pushes are found again backward: layer
+d - 1 is streamed and expanded until a node with a successor of the wanted key is met, down to the root.
+The work files are created in a temporary directory, inside `directory` when it is given, and deleted at the end.
+"""
+
+import heapq
+import os
+import shutil
+import struct
+import tempfile
+from modules.search_node import SearchNode
+
+DEFAULT_BUFFER_SIZE = 1 << 20  # Successor records held in memory before a sorted run is written
+READ_RECORDS = 4096  # Records read from a file at a time
+
+
+class KeyCodec:
+    """Pack the key of a node into a fixed-size record, and unpack a record into a node"""
+
+    def __init__(self, layout, box_count):
+        self.layout = layout
+        self.cells = sorted(layout.floor)
+        if len(self.cells) > 1 << 16:
+            raise Exception('Invalid level for the external-memory search: too many floor cells')
+        self.index = {cell: position for position, cell in enumerate(self.cells)}
+        self.record = struct.Struct('>{}H'.format(box_count + 1))
+        self.size = self.record.size
+
+    def pack(self, node):
+        index = self.index
+        return self.record.pack(index[node.get_canonical_player()], *sorted(index[box] for box in node.boxes))
+
+    def unpack(self, record):
+        cells = self.cells
+        player, *boxes = self.record.unpack(record)
+        return SearchNode(self.layout, cells[player], frozenset(cells[box] for box in boxes))
+
+
+def iter_records(path, size):
+    """Read the fixed-size records of a file as a stream"""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(size * READ_RECORDS)
+            if not chunk:
+                break
+            for start in range(0, len(chunk), size):
+                yield chunk[start:start + size]
+
+
+def write_records(path, records):
+    """Write records to a file and return how many were written"""
+    count = 0
+    with open(path, 'wb') as f:
+        for record in records:
+            f.write(record)
+            count += 1
+    return count
+
+
+def unique(records):
+    """Drop the repeated records of a sorted stream"""
+    previous = None
+    for record in records:
+        if record != previous:
+            yield record
+            previous = record
+
+
+class ExternalBFS:
+    def __init__(self, solver, directory=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.solver = solver
+        self.root = solver.initial_node
+        self.codec = KeyCodec(self.root.layout, len(self.root.boxes))
+        self.directory = directory
+        self.buffer_size = max(1, buffer_size)
+        self.path = None  # Temporary directory of the work files, during search()
+        self.run_count = 0  # Sorted run files written by the last expand_layer()
+
+    def get_path(self, kind, number):
+        return os.path.join(self.path, '{}-{:06d}.bin'.format(kind, number))
+
+    def search(self):
+        """Run the search and return the pushes of a shortest solution, or None if the level is unsolvable"""
+        if self.root.check_solved():
+            return []
+        self.path = tempfile.mkdtemp(prefix='sokoban-bfs-', dir=self.directory)
+        try:
+            return self.search_layers()
+        finally:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
+
+    def search_layers(self):
+        codec = self.codec
+        write_records(self.get_path('layer', 0), [codec.pack(self.root)])
+        shutil.copyfile(self.get_path('layer', 0), self.get_path('closed', 0))
+        depth = 0
+        layer_size = 1
+
+        while layer_size:
+            goal_node = self.expand_layer(depth, layer_size)
+            if goal_node is not None:
+                return self.rebuild_pushes(goal_node, depth)
+            layer_size = self.merge_layer(depth)
+            self.solver.generated_states += layer_size
+            depth += 1
+        return None
+
+    def expand_layer(self, depth, layer_size):
+        """Expand every node of a layer into sorted runs of successor records.
+        Return the first solved successor found, with its parent chain back to the expanded node, or None."""
+        solver = self.solver
+        codec = self.codec
+        buffer = set()
+        run_count = 0
+        for record in iter_records(self.get_path('layer', depth), codec.size):
+            node = codec.unpack(record)
+            layer_size -= 1
+            solver.count_expansion(layer_size, depth)
+            for action in solver.get_legal_actions(node):
+                next_node = solver.get_next_state(node, action)
+                if next_node.check_solved():
+                    return next_node
+                buffer.add(codec.pack(next_node))
+            if len(buffer) >= self.buffer_size:
+                write_records(self.get_path('run', run_count), sorted(buffer))
+                run_count += 1
+                buffer.clear()
+        if buffer:
+            write_records(self.get_path('run', run_count), sorted(buffer))
+            run_count += 1
+        self.run_count = run_count
+        return None
+
+    def merge_layer(self, depth):
+        """Merge the runs into layer depth + 1 without the records of the earlier layers, and add it to the closed
+        file. Return the size of the new layer."""
+        size = self.codec.size
+        runs = [self.get_path('run', number) for number in range(self.run_count)]
+        candidates = unique(heapq.merge(*[iter_records(run, size) for run in runs]))
+        closed = iter_records(self.get_path('closed', depth), size)
+
+        layer_size = 0
+        with open(self.get_path('layer', depth + 1), 'wb') as layer, \
+                open(self.get_path('closed', depth + 1), 'wb') as new_closed:
+            seen = next(closed, None)
+            for record in candidates:
+                while seen is not None and seen < record:
+                    new_closed.write(seen)
+                    seen = next(closed, None)
+                if seen == record:
+                    continue  # Reached by an earlier layer
+                layer.write(record)
+                new_closed.write(record)
+                layer_size += 1
+            while seen is not None:
+                new_closed.write(seen)
+                seen = next(closed, None)
+
+        for run in runs:
+            os.remove(run)
+        os.remove(self.get_path('closed', depth))
+        return layer_size
+
+    def rebuild_pushes(self, goal_node, depth):
+        """Find the pushes from the root to the goal node, whose parent chain ends at a node of layer `depth`"""
+        codec = self.codec
+        pushes = []
+        node = goal_node
+        while True:
+            # The pushes from the expanded node to its successor; more than one for a macro move
+            chain = []
+            while node.parent is not None:
+                chain.append(node.last_push)
+                node = node.parent
+            pushes.extend(chain)  # Backward, like the whole list until it is reversed
+            if depth == 0:
+                break
+
+            wanted = codec.pack(node)
+            depth -= 1
+            node = self.find_parent(depth, wanted)
+        pushes.reverse()
+        return pushes
+
+    def find_parent(self, depth, wanted):
+        """Stream layer `depth` and return the successor with the wanted record, with its parent chain"""
+        solver = self.solver
+        codec = self.codec
+        for record in iter_records(self.get_path('layer', depth), codec.size):
+            node = codec.unpack(record)
+            for action in solver.get_legal_actions(node):
+                next_node = solver.get_next_state(node, action)
+                if codec.pack(next_node) == wanted:
+                    return next_node
+        raise Exception('Invalid external search: no parent found in layer {}'.format(depth))
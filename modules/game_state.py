@@ -30,7 +30,6 @@ class GameState:
         self.boxes = self.find_boxes()
         self.targets = self.find_targets()
         self.is_solved = self.check_solved()
-        self.solution_path = [] 
     def hash(self):
         """Generate a hash value for the game state."""
         map_hash = hash(tuple(map(tuple, self.map)))  # Hash the map configuration
@@ -74,11 +73,11 @@ class GameState:
         return boxes
 
     def find_targets(self):
-        """Find all the targets in the map and return their positions"""
+        """Find all the targets in the map and return their positions, including the one under the player ('+')"""
         targets = []
         for row in range(self.height):
             for col in range(self.width):
-                if self.map[row][col] in ['.', '*']:
+                if self.map[row][col] in ['.', '*', '+']:
                     targets.append((row, col))
         return targets
 
@@ -167,7 +166,6 @@ class GameState:
         new_state.boxes = state.boxes[:]
         new_state.targets = state.targets[:]
         new_state.is_solved = state.is_solved
-        new_state.solution_path = state.solution_path[:]
         
         if new_state.is_empty((new_row, new_col)):
             # If the new position is empty, move the player
@@ -1,5 +1,8 @@
 # Visualize the game using pygame
 # The game visualization based on game state and solution
+# The static cells (walls, floor, targets) are drawn once into a background surface. Playing the solution back only
+# redraws the cells touched by each move, at most the old player cell, the new player cell and the pushed box cell,
+# and updates just those rectangles of the display.
 #
 # Path: modules/game_visualization.py
 
@@ -10,48 +13,34 @@ import os
 import time
 from pygame.locals import *
 from modules.game_state import GameState
+from modules.rendering import SpriteAtlas, get_cell_size, render_background
+from modules.search_node import DIRECTIONS
 from pygame.locals import QUIT
 
+SPEEDS = [1, 2, 4, 8, 16, 32, 64]  # Playback speeds in moves per second
+
 
 class GameVisualization(object):
-    def __init__(self, initial_state: GameState, solution: List[str]):
+    def __init__(self, initial_state: GameState, solution: List[str], speed=2):
         self.game_state = initial_state
         self.solution = solution
         self.screen = None
         self.clock = None
         self.font = None
-        self.block_size = 50
-        self.margin = 15
-        self.width = (self.block_size + self.margin) * \
-            self.game_state.width + self.margin+200
-        self.height = (self.block_size + self.margin) * \
-            self.game_state.height + self.margin+200
-        self.x_offset = (self.width - self.game_state.width *
-                         self.block_size - self.margin) / 2
-        self.y_offset = (self.height - self.game_state.height *
-                         self.block_size - self.margin) / 2
-
-        # Load assets
-        self.load_assets()
-
-    def load_assets(self):
-        # Load player image with 4 directions
-        self.player_up_image = pygame.image.load(
-            os.path.join('assets', 'player_up.png'))
-        self.player_down_image = pygame.image.load(
-            os.path.join('assets', 'player_down.png'))
-        self.player_left_image = pygame.image.load(
-            os.path.join('assets', 'player_left.png'))
-        self.player_right_image = pygame.image.load(
-            os.path.join('assets', 'player_right.png'))
+        self.atlas = None
+        self.background = None
+        self.speed = speed  # Moves per second, one of SPEEDS
+        self.margin = 100
+        self.block_size = get_cell_size(self.game_state.map, 1400 - 2 * self.margin, 800 - 2 * self.margin)
+        self.width = self.block_size * self.game_state.width + 2 * self.margin
+        self.height = self.block_size * self.game_state.height + 2 * self.margin
+        self.x_offset = self.margin
+        self.y_offset = self.margin
 
-        self.wall_image = pygame.image.load(os.path.join('assets', 'wall.png'))
-        self.box_image = pygame.image.load(os.path.join('assets', 'box.png'))
-        self.box_on_target_image = pygame.image.load(os.path.join('assets', 'crate_10.png'))
-        self.target_image = pygame.image.load(
-            os.path.join('assets', 'target.png'))
-        self.floor_image = pygame.image.load(
-            os.path.join('assets', 'floor.png'))
+        # Positions replayed by draw_solution, without building a GameState for every move
+        self.player = self.game_state.find_player()
+        self.boxes = set(self.game_state.find_boxes())
+        self.targets = set(self.game_state.find_targets())
 
     def init_pygame(self):
         pygame.init()
@@ -59,56 +48,108 @@ class GameVisualization(object):
         pygame.display.set_caption('Sokuban')
         self.clock = pygame.time.Clock()
         self.font = pygame.font.SysFont('Arial', 20)
+        self.atlas = SpriteAtlas()
+        self.background = render_background(self.game_state.map, self.atlas, self.block_size)
+
+    def get_rect(self, position):
+        row, col = position
+        return pygame.Rect(self.x_offset + col * self.block_size, self.y_offset + row * self.block_size,
+                           self.block_size, self.block_size)
+
+    def draw_cell(self, position, direction='U'):
+        """Redraw one cell from the background, then its box or player, and return its rectangle"""
+        rect = self.get_rect(position)
+        self.screen.blit(self.background, rect, rect.move(-self.x_offset, -self.y_offset))
+        if position in self.boxes:
+            name = 'box_on_target' if position in self.targets else 'box'
+            self.screen.blit(self.atlas.get(name, self.block_size), rect)
+        elif position == self.player:
+            if direction not in DIRECTIONS:
+                raise Exception('Invalid direction')
+            self.screen.blit(self.atlas.get('player_' + direction, self.block_size), rect)
+        return rect
 
-    def draw(self, direction='U'):
+    def draw_status(self, moves_done):
+        """Draw the playback status above the map and return its rectangle"""
+        rect = pygame.Rect(0, 0, self.width, self.margin // 2)
+        self.screen.fill((0, 0, 0), rect)
+        text = "Move {}/{}  Speed: {} moves/s  (arrow up/down: speed, space: skip to the end)".format(
+            moves_done, len(self.solution or []), self.speed)
+        self.screen.blit(self.font.render(text, True, (255, 255, 255)), (10, 10))
+        return rect
+
+    def draw(self, direction='U', moves_done=0):
+        """Draw the whole board"""
         self.screen.fill((0, 0, 0))
-        for i in range(self.game_state.height):
-            for j in range(self.game_state.width):
-                x = self.x_offset + j * (self.block_size + self.margin)
-                y = self.y_offset + i * (self.block_size + self.margin)
-                rect = pygame.Rect(x, y, self.block_size, self.block_size)
-                if self.game_state.is_wall((i, j)):
-                    self.screen.blit(self.wall_image, rect)
-                elif self.game_state.is_box((i, j)):
-                    if self.game_state.is_target((i, j)):
-                        self.screen.blit(self.box_on_target_image, rect)
-                    else:
-                        self.screen.blit(self.box_image, rect)
-                elif self.game_state.is_target((i, j)):
-                    self.screen.blit(self.target_image, rect)
-                else:
-                    self.screen.blit(self.floor_image, rect)
-        player_row, player_col = self.game_state.find_player()
-        x = self.x_offset + player_col * (self.block_size + self.margin)
-        y = self.y_offset + player_row * (self.block_size + self.margin)
-        rect = pygame.Rect(x, y, self.block_size, self.block_size)
-        if direction == 'U':
-            self.screen.blit(self.player_up_image, rect)
-        elif direction == 'D':
-            self.screen.blit(self.player_down_image, rect)
-        elif direction == 'L':
-            self.screen.blit(self.player_left_image, rect)
-        elif direction == 'R':
-            self.screen.blit(self.player_right_image, rect)
-        else:
-            raise Exception('Invalid direction')
+        self.screen.blit(self.background, (self.x_offset, self.y_offset))
+        for box in self.boxes:
+            self.draw_cell(box)
+        self.draw_cell(self.player, direction)
+        self.draw_status(moves_done)
         pygame.display.flip()
 
+    def apply_move(self, direction):
+        """Move the player like GameState.move, pushing a box if there is one.
+        Return the cells whose content changed."""
+        row, col = self.player
+        d_row, d_col = DIRECTIONS[direction]
+        new_player = (row + d_row, col + d_col)
+        if self.game_state.is_wall(new_player):
+            return []
+        if new_player not in self.boxes:
+            self.player = new_player
+            return [(row, col), new_player]
+        new_box = (new_player[0] + d_row, new_player[1] + d_col)
+        if self.game_state.is_wall(new_box) or new_box in self.boxes:
+            return []
+        self.boxes.remove(new_player)
+        self.boxes.add(new_box)
+        self.player = new_player
+        return [(row, col), new_player, new_box]
+
+    def handle_events(self):
+        """Handle the window events during playback; return True when the user asks to skip to the end"""
+        skip = False
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                pygame.quit()
+                sys.exit()
+            if event.type == KEYDOWN:
+                index = SPEEDS.index(self.speed) if self.speed in SPEEDS else 1
+                if event.key == K_UP:
+                    self.speed = SPEEDS[min(index + 1, len(SPEEDS) - 1)]
+                elif event.key == K_DOWN:
+                    self.speed = SPEEDS[max(index - 1, 0)]
+                elif event.key in (K_SPACE, K_RETURN):
+                    skip = True
+        return skip
 
     def draw_solution(self):
         if self.solution is None:
             print("No solution available.")
             self.draw_no_solution_image()
             return
+        next_move_time = time.time() + 1.0 / self.speed
         for i in range(len(self.solution)):
-            self.game_state = self.game_state.move(self.solution[i])
-            self.draw(self.solution[i])
-            time.sleep(0.5)
+            while time.time() < next_move_time:
+                if self.handle_events():
+                    # Skip to the end: apply the remaining moves without drawing them
+                    for direction in self.solution[i:]:
+                        self.apply_move(direction)
+                    self.draw(self.solution[-1], len(self.solution))
+                    return
+                self.clock.tick(60)
+            next_move_time = max(next_move_time + 1.0 / self.speed, time.time())
+            rects = [self.draw_cell(cell, self.solution[i]) for cell in self.apply_move(self.solution[i])]
+            rects.append(self.draw_status(i + 1))
+            pygame.display.update(rects)
+
     def draw_no_solution_image(self):
         # Load and display a "No Solution" image
         no_solution_image = pygame.image.load(os.path.join('assets', 'no_solution.png'))
         self.screen.blit(no_solution_image, (0, 0))
         pygame.display.flip()
+
     def start(self):
         self.init_pygame()
         self.draw()
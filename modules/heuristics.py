@@ -0,0 +1,241 @@
+"""
+Heuristics for the informed search strategies
+A heuristic estimates the number of pushes left to solve a node. The available heuristics are:
+- 'manhattan': each box to its nearest target by Manhattan distance, ignoring walls (SearchNode.get_heuristic()).
+- 'push_distance': true push distances over the walls, each box to its nearest target and each target to its
+  nearest box, keeping the larger of the two sums. It is a cheap lower bound of 'matching'.
+- 'matching': minimum-cost perfect matching of boxes to targets on the push distances (Hungarian algorithm),
+  so two boxes cannot claim the same target.
+- 'pdb': exact costs of small groups of boxes taken from the pattern database of the level, added up over disjoint
+  groups (see modules/pattern_database.py). The database is built or memory-mapped the first time it is needed.
+- 'pdb_matching': the larger of 'pdb' and 'matching'.
+combine() builds the max or the sum of several heuristics. The max of admissible heuristics is admissible; the sum is
+only admissible when each heuristic counts the pushes of different boxes.
+The push distances are computed once per level by compute_push_distances(), stored in the Layout and looked up
+by the heuristics. Every heuristic is admissible and returns INFINITY when a box cannot reach any target.
+
+Every heuristic is called as heuristic(node, parent, moved). A push moves exactly one box, so when the parent was
+already evaluated and moved is the (old, new) position of that box, the value is derived from the parent:
+- 'manhattan' and 'push_distance' swap the contribution of the moved box, looked up in a per-cell table,
+- 'push_distance' also keeps the box sum and the nearest-box distance of every target in node.heuristic_data,
+- 'matching' keeps the box -> target assignment in node.heuristic_data and only runs the Hungarian algorithm again
+  when the change of the moved box can make another assignment cheaper.
+With parent=None the value is computed from scratch.
+"""
+
+from collections import deque
+from modules.pattern_database import load_pattern_database
+
+INFINITY = float('inf')
+
+
+def compute_push_distances(floor, targets):
+    """Compute the number of pushes needed to bring a box from every floor cell to every target.
+    The result maps a cell to a tuple of distances, in the order of the given targets list. It is computed with a
+    reverse BFS from each target: a box can be pulled from c to c + d when the player has room at c + 2d."""
+    distances = {cell: [INFINITY] * len(targets) for cell in floor}
+    for index, target in enumerate(targets):
+        distances[target][index] = 0
+        queue = deque([target])
+        while queue:
+            row, col = queue.popleft()
+            distance = distances[(row, col)][index] + 1
+            for d_row, d_col in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                box = (row + d_row, col + d_col)
+                player = (row + 2 * d_row, col + 2 * d_col)
+                if box in floor and player in floor and distances[box][index] == INFINITY:
+                    distances[box][index] = distance
+                    queue.append(box)
+    return {cell: tuple(cell_distances) for cell, cell_distances in distances.items()}
+
+
+def compute_nearest_distances(floor, targets, push_distances):
+    """Compute, for every floor cell, the Manhattan and the push distance to the nearest target.
+    These are the contributions of a single box to the 'manhattan' and 'push_distance' heuristics."""
+    nearest_manhattan = {}
+    nearest_push = {}
+    for cell in floor:
+        nearest_manhattan[cell] = min(
+            (abs(cell[0] - target[0]) + abs(cell[1] - target[1]) for target in targets), default=INFINITY)
+        nearest_push[cell] = min(push_distances[cell], default=INFINITY)
+    return nearest_manhattan, nearest_push
+
+
+def _can_update(parent, moved):
+    return parent is not None and moved is not None and parent.heuristic_value not in (None, INFINITY)
+
+
+def manhattan(node, parent=None, moved=None):
+    """Sum of the Manhattan distances of each box to its nearest target"""
+    nearest = node.layout.nearest_manhattan
+    if _can_update(parent, moved):
+        old_box, new_box = moved
+        return parent.heuristic_value - nearest[old_box] + nearest[new_box]
+    return sum(nearest[box] for box in node.boxes)
+
+
+def push_distance(node, parent=None, moved=None):
+    """Lower bound on the pushes left using the precomputed push distances"""
+    layout = node.layout
+    nearest = layout.nearest_push
+    push_distances = layout.push_distances
+    square = len(node.boxes) == len(layout.target_list)  # Otherwise the target side is not a lower bound
+
+    if _can_update(parent, moved):
+        old_box, new_box = moved
+        parent_box_sum, parent_target_mins = parent.heuristic_data
+        box_sum = parent_box_sum - nearest[old_box] + nearest[new_box]
+        target_mins = None
+        if square:
+            # The nearest box of a target only has to be searched again if it was the moved box
+            old_row = push_distances[old_box]
+            new_row = push_distances[new_box]
+            target_mins = list(parent_target_mins)
+            for index, target_min in enumerate(target_mins):
+                if new_row[index] < target_min:
+                    target_mins[index] = new_row[index]
+                elif old_row[index] == target_min and new_row[index] > target_min:
+                    target_mins[index] = min(push_distances[box][index] for box in node.boxes)
+    else:
+        box_sum = sum(nearest[box] for box in node.boxes)
+        target_mins = None
+        if square:
+            rows = [push_distances[box] for box in node.boxes]
+            target_mins = [min(column) for column in zip(*rows)]
+
+    node.heuristic_data = (box_sum, target_mins)
+    if target_mins is None:
+        return box_sum
+    return max(box_sum, sum(target_mins))
+
+
+def hungarian(cost):
+    """Solve the assignment problem on a n x m cost matrix with n <= m.
+    Return the minimum total cost and the column assigned to every row.
+    This is the O(n^2 m) version of the Hungarian algorithm with row and column potentials."""
+    n = len(cost)
+    m = len(cost[0]) if n else 0
+    u = [0] * (n + 1)
+    v = [0] * (m + 1)
+    match = [0] * (m + 1)  # match[j] is the row assigned to column j (1-based, 0 means free)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        match[0] = i
+        j0 = 0
+        min_values = [INFINITY] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = match[j0]
+            delta = INFINITY
+            j1 = 0
+            row = cost[i0 - 1]
+            for j in range(1, m + 1):
+                if not used[j]:
+                    current = row[j - 1] - u[i0] - v[j]
+                    if current < min_values[j]:
+                        min_values[j] = current
+                        way[j] = j0
+                    if min_values[j] < delta:
+                        delta = min_values[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_values[j] -= delta
+            j0 = j1
+            if match[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            match[j0] = match[j1]
+            j0 = j1
+    assignment = [0] * n
+    for j in range(1, m + 1):
+        if match[j]:
+            assignment[match[j] - 1] = j - 1
+    return sum(cost[i][assignment[i]] for i in range(n)), assignment
+
+
+def matching(node, parent=None, moved=None):
+    """Minimum-cost perfect matching of the boxes to the targets on the push distances"""
+    push_distances = node.layout.push_distances
+    if len(node.boxes) > len(node.layout.target_list):
+        return INFINITY
+    # An unreachable pair gets a cost larger than any real matching, so that it is only used when nothing else is
+    unreachable = len(push_distances) * (len(node.boxes) + 1)
+
+    def costs(box):
+        return [distance if distance != INFINITY else unreachable for distance in push_distances[box]]
+
+    if _can_update(parent, moved):
+        # Only the row of the moved box changed. The parent assignment stays optimal if the cost of the target it
+        # gave to that box changed the least of the whole row; any other assignment gains at most as much.
+        old_box, new_box = moved
+        assignment = dict(parent.heuristic_data)
+        target = assignment.pop(old_box)
+        old_row = costs(old_box)
+        new_row = costs(new_box)
+        changes = [new - old for new, old in zip(new_row, old_row)]
+        if changes[target] <= min(changes):
+            assignment[new_box] = target
+            node.heuristic_data = assignment
+            total = parent.heuristic_value + changes[target]
+            return total if total < unreachable else INFINITY
+
+    boxes = list(node.boxes)
+    total, columns = hungarian([costs(box) for box in boxes])
+    node.heuristic_data = dict(zip(boxes, columns))
+    return total if total < unreachable else INFINITY
+
+
+def pattern_database(node, parent=None, moved=None):
+    """Sum of the pattern database values of disjoint groups of boxes"""
+    layout = node.layout
+    if layout.pattern_database is None:
+        layout.pattern_database = load_pattern_database(layout)
+    return layout.pattern_database.estimate(node.boxes, layout.nearest_push)
+
+
+class Evaluation:
+    """The value and the data one heuristic of a combination left on a node, kept so that the heuristic can
+    update them incrementally on the children, as it would with its own parent node"""
+    __slots__ = ('heuristic_value', 'heuristic_data')
+
+    def __init__(self, heuristic_value, heuristic_data):
+        self.heuristic_value = heuristic_value
+        self.heuristic_data = heuristic_data
+
+
+def combine(functions, combination=max):
+    """Build a heuristic that combines the values of several heuristics with max or sum"""
+
+    def combined(node, parent=None, moved=None):
+        evaluations = []
+        for index, function in enumerate(functions):
+            previous = parent.heuristic_data[index] if parent is not None and parent.heuristic_data else None
+            node.heuristic_data = None
+            value = function(node, previous, moved)
+            evaluations.append(Evaluation(value, node.heuristic_data))
+        node.heuristic_data = evaluations
+        return combination(evaluation.heuristic_value for evaluation in evaluations)
+
+    return combined
+
+
+HEURISTICS = {
+    'manhattan': manhattan,
+    'push_distance': push_distance,
+    'matching': matching,
+    'pdb': pattern_database,
+    'pdb_matching': combine([pattern_database, matching], max),
+}
+
+
+def get_heuristic_function(name):
+    """Get a heuristic function by name"""
+    if name not in HEURISTICS:
+        raise Exception('Invalid heuristic')
+    return HEURISTICS[name]
@@ -0,0 +1,106 @@
+"""
+Instrumentation of the solver
+A Solver reports what it is doing to an Instrumentation object:
+- on_start(solver) when a search starts,
+- on_progress(solver, progress) every `interval` seconds during the search,
+- on_finish(solver, stats) when the search ends, with the statistics printed by print_stats.
+The progress is a dictionary with the elapsed time, the expanded and generated nodes, the nodes per second, the
+frontier and closed-set sizes, the best f and h seen so far and the peak memory of the process.
+
+The Profiler is optional. It measures the time spent in each hot path of the search (successor generation,
+hashing and transposition table, heuristic, frontier operations), timing one call out of `sample_every` to keep
+its overhead low and scaling the sampled time up to every call.
+"""
+
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, the peak memory is then not reported
+    resource = None
+
+
+def get_peak_rss_kb():
+    """Get the peak resident memory of the current process, in kilobytes"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # macOS reports bytes, Linux kilobytes
+
+
+def get_rss_kb():
+    """Get the current resident memory of the current process, in kilobytes.
+    Read from /proc on Linux; elsewhere the peak resident memory is the closest measure available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * (os.sysconf('SC_PAGE_SIZE') // 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return get_peak_rss_kb()
+
+
+class Instrumentation:
+    """Instrumentation that does nothing; subclass it and override the hooks you need"""
+
+    def __init__(self, interval=1.0, profiler=None):
+        self.interval = interval  # Seconds between two on_progress calls
+        self.profiler = profiler
+
+    def on_start(self, solver):
+        pass
+
+    def on_progress(self, solver, progress):
+        pass
+
+    def on_finish(self, solver, stats):
+        pass
+
+
+class PrintProgress(Instrumentation):
+    """Print a line of progress every interval seconds"""
+
+    def on_progress(self, solver, progress):
+        print("[{:.1f}s] expanded={} generated={} nodes/s={:.0f} frontier={} closed={} best f={} best h={} "
+              "peak RSS={} KB".format(
+                  progress['elapsed'], progress['expanded_states'], progress['generated_states'],
+                  progress['nodes_per_second'], progress['frontier_size'], progress['closed_size'],
+                  progress['best_total_cost'], progress['best_heuristic'], progress['peak_rss_kb']))
+
+
+class Profiler:
+    """Sample the time spent in the hot paths of the search"""
+
+    SECTIONS = ['successors', 'hashing', 'heuristic', 'frontier']
+
+    def __init__(self, sample_every=16):
+        self.sample_every = sample_every
+        self.calls = {section: 0 for section in self.SECTIONS}
+        self.sampled_time = {section: 0.0 for section in self.SECTIONS}
+
+    def wrap(self, section, function):
+        """Return a function that behaves like the given one and samples its time into the section"""
+        calls = self.calls
+        sampled_time = self.sampled_time
+        sample_every = self.sample_every
+
+        def timed(*args, **kwargs):
+            calls[section] += 1
+            if calls[section] % sample_every:
+                return function(*args, **kwargs)
+            start_time = time.perf_counter()
+            result = function(*args, **kwargs)
+            sampled_time[section] += time.perf_counter() - start_time
+            return result
+
+        return timed
+
+    def get_stats(self):
+        """Get the estimated seconds spent and the number of calls of every section"""
+        return {
+            section: {
+                'calls': self.calls[section],
+                'seconds': round(self.sampled_time[section] * self.sample_every, 6),
+            }
+            for section in self.SECTIONS
+        }
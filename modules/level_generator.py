@@ -0,0 +1,85 @@
+"""
+Random level generator
+Levels are generated backwards so that they are always solvable: the boxes start on the targets and the player
+walks randomly, pulling a box behind it from time to time. Playing the pulls in reverse solves the level.
+The random inner walls may cut the room into several parts; only the largest one is kept, the others become walls,
+so that the player can reach every box and target.
+The generated map uses the same characters as the map files (see modules/game_state.py).
+"""
+
+import random
+
+DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+def get_components(cells):
+    """Split a list of cells into its 4-connected components, in the order of their first cell"""
+    remaining = set(cells)
+    components = []
+    for start in cells:
+        if start not in remaining:
+            continue
+        remaining.remove(start)
+        component = {start}
+        stack = [start]
+        while stack:
+            row, col = stack.pop()
+            for d_row, d_col in DIRECTIONS:
+                cell = (row + d_row, col + d_col)
+                if cell in remaining:
+                    remaining.remove(cell)
+                    component.add(cell)
+                    stack.append(cell)
+        components.append(component)
+    return components
+
+
+def generate_level(seed, width=9, height=8, boxes=3, steps=300, wall_density=0.1):
+    """Generate a solvable level as a 2D list of characters. The same seed always gives the same level."""
+    rng = random.Random(seed)
+
+    # A room surrounded by walls, with a few random inner walls
+    walls = set()
+    for row in range(height):
+        for col in range(width):
+            if row in (0, height - 1) or col in (0, width - 1) or rng.random() < wall_density:
+                walls.add((row, col))
+    floor = [(row, col) for row in range(height) for col in range(width) if (row, col) not in walls]
+    largest = max(get_components(floor), key=len, default=set())
+    walls.update(cell for cell in floor if cell not in largest)
+    floor = [cell for cell in floor if cell in largest]
+    if len(floor) < boxes + 1:
+        raise ValueError('The room is too small for the number of boxes')
+
+    cells = rng.sample(floor, boxes + 1)
+    targets = set(cells[:boxes])
+    box_positions = set(targets)
+    player = cells[boxes]
+
+    for _ in range(steps):
+        d_row, d_col = rng.choice(DIRECTIONS)
+        new_player = (player[0] + d_row, player[1] + d_col)
+        if new_player in walls or new_player in box_positions:
+            continue
+        # The box on the other side of the player follows it half of the time
+        behind = (player[0] - d_row, player[1] - d_col)
+        if behind in box_positions and rng.random() < 0.5:
+            box_positions.remove(behind)
+            box_positions.add(player)
+        player = new_player
+
+    game_map = []
+    for row in range(height):
+        line = []
+        for col in range(width):
+            cell = (row, col)
+            if cell in walls:
+                line.append('#')
+            elif cell == player:
+                line.append('+' if cell in targets else '@')
+            elif cell in box_positions:
+                line.append('*' if cell in targets else '$')
+            else:
+                line.append('.' if cell in targets else ' ')
+        game_map.append(line)
+    return game_map
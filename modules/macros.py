@@ -0,0 +1,206 @@
+"""
+Macro moves of the push-level search
+Some pushes leave no real choice, so the search can take several of them as a single successor:
+- Tunnel macro: a tunnel cell, for a push direction, is a floor cell whose two sides across that direction are walls.
+  When a push leaves both the player and the box on tunnel cells, nothing but pushing the box on can change the
+  box, so it keeps being pushed until it leaves the tunnel, reaches a target or would be blocked or deadlocked.
+- Goal room macro: a goal room is an area holding targets whose only way in is one entrance cell, with no box and
+  no player inside at the start. The order in which its targets can be filled is computed once per level, working
+  backward from the full room. When a box is pushed onto the entrance and the room holds exactly the first boxes of
+  that order, the box is pushed straight to the next target along a precomputed path. Goal rooms are only used when
+  the level has as many boxes as targets: with more targets, a box may be better left on a target nearer the
+  entrance, and the macro would lose the shortest solutions.
+The macro pushes are applied one at a time with SearchNode.push(), so every intermediate node is in the parent chain
+of the final one and the solution is rebuilt as usual. The cost of a macro is its number of pushes.
+"""
+
+from collections import deque
+from modules.deadlock import is_freeze_deadlock
+from modules.search_node import DIRECTIONS
+
+PERPENDICULAR = {
+    'U': [(0, -1), (0, 1)],
+    'D': [(0, -1), (0, 1)],
+    'L': [(-1, 0), (1, 0)],
+    'R': [(-1, 0), (1, 0)],
+}
+
+
+def find_tunnels(floor):
+    """Find, for every push direction, the floor cells whose two sides across the direction are walls"""
+    tunnels = {}
+    for direction, sides in PERPENDICULAR.items():
+        tunnels[direction] = frozenset(
+            (row, col) for row, col in floor
+            if all((row + d_row, col + d_col) not in floor for d_row, d_col in sides))
+    return tunnels
+
+
+def _components(cells):
+    """Split a set of cells into its 4-connected components"""
+    remaining = set(cells)
+    components = []
+    while remaining:
+        start = remaining.pop()
+        component = {start}
+        stack = [start]
+        while stack:
+            row, col = stack.pop()
+            for d_row, d_col in DIRECTIONS.values():
+                cell = (row + d_row, col + d_col)
+                if cell in remaining:
+                    remaining.remove(cell)
+                    component.add(cell)
+                    stack.append(cell)
+        components.append(frozenset(component))
+    return components
+
+
+def find_push_path(allowed, obstacles, box, player, goal):
+    """Find the shortest list of (box, direction) pushes that brings a box from `box` to `goal`, with the player
+    starting at `player`. The player and the box stay within the allowed cells and do not enter the obstacles."""
+    free = allowed - obstacles
+
+    def region(box, player):
+        cells = {player}
+        stack = [player]
+        while stack:
+            row, col = stack.pop()
+            for d_row, d_col in DIRECTIONS.values():
+                cell = (row + d_row, col + d_col)
+                if cell in free and cell != box and cell not in cells:
+                    cells.add(cell)
+                    stack.append(cell)
+        return cells
+
+    start_region = region(box, player)
+    start = (box, min(start_region))
+    parents = {start: None}
+    queue = deque([(box, start_region, start)])
+    while queue:
+        box, reachable, state = queue.popleft()
+        if box == goal:
+            pushes = []
+            while parents[state] is not None:
+                state, push = parents[state]
+                pushes.append(push)
+            pushes.reverse()
+            return pushes
+        for direction, (d_row, d_col) in DIRECTIONS.items():
+            new_box = (box[0] + d_row, box[1] + d_col)
+            if (box[0] - d_row, box[1] - d_col) not in reachable or new_box not in free:
+                continue
+            new_region = region(new_box, box)
+            new_state = (new_box, min(new_region))
+            if new_state not in parents:
+                parents[new_state] = (state, (box, direction))
+                queue.append((new_box, new_region, new_state))
+    return None
+
+
+class GoalRoom:
+    """A goal room, its entrance and the push paths that fill its targets in order"""
+
+    def __init__(self, entrance, cells, order, paths):
+        self.entrance = entrance
+        self.cells = cells
+        self.order = order  # Targets of the room in the order they are filled
+        self.paths = paths  # paths[i][player] pushes the i-th box from the entrance, with the player at `player`
+
+
+def find_goal_rooms(layout, boxes, player):
+    """Find the goal rooms of the level and the order in which their targets can be filled"""
+    if len(boxes) != len(layout.targets):
+        return []  # Some targets stay empty, so a room does not have to be filled deepest target first
+    floor = layout.floor
+    candidates = []
+    for entrance in sorted(floor - layout.targets):
+        for cells in _components(floor - {entrance}):
+            if cells & layout.targets and not cells & boxes and player not in cells:
+                entries = [cell for cell in floor - cells - {entrance}
+                           if abs(cell[0] - entrance[0]) + abs(cell[1] - entrance[1]) == 1]
+                if entries:
+                    candidates.append((entrance, cells, entries))
+
+    rooms = []
+    for entrance, cells, entries in candidates:
+        if any(cells < other_cells for _, other_cells, _ in candidates):
+            continue  # Only keep the outermost room
+        room = _build_goal_room(cells & layout.targets, entrance, cells, entries)
+        if room is not None:
+            rooms.append(room)
+    return rooms
+
+
+def _build_goal_room(targets, entrance, cells, entries):
+    """Order the targets of a room by emptying it backward: the last target filled is one whose box can still be
+    pushed in from the entrance while every other target holds a box. Return None if the room cannot be ordered."""
+    filled = set(targets)
+    order = []
+    while filled:
+        for target in sorted(filled):
+            obstacles = filled - {target}
+            if any(find_push_path(cells | {entrance, entry}, obstacles, entrance, entry, target) is not None
+                   for entry in entries):
+                order.append(target)
+                filled.remove(target)
+                break
+        else:
+            return None
+    order.reverse()
+
+    paths = []
+    for index, target in enumerate(order):
+        obstacles = set(order[:index])
+        paths.append({
+            entry: find_push_path(cells | {entrance, entry}, obstacles, entrance, entry, target)
+            for entry in entries
+        })
+    return GoalRoom(entrance, cells, order, paths)
+
+
+class MacroMoves:
+    """Tunnels and goal rooms of a level, and the macro moves that extend a push through them"""
+
+    def __init__(self, root):
+        layout = root.layout
+        self.layout = layout
+        self.tunnels = find_tunnels(layout.floor)
+        self.rooms = {room.entrance: room for room in find_goal_rooms(layout, root.boxes, root.player)}
+
+    def extend(self, node):
+        """Extend the push that created the node by the macro moves that follow it and return the last node"""
+        layout = self.layout
+        while node.last_push is not None:
+            box, direction = node.last_push
+            d_row, d_col = DIRECTIONS[direction]
+            new_box = (box[0] + d_row, box[1] + d_col)
+
+            room = self.rooms.get(new_box)
+            if room is not None:
+                return self.fill_room(node, room)
+
+            # Keep pushing through the tunnel while the box stays in it
+            tunnel = self.tunnels[direction]
+            if box not in tunnel or new_box not in tunnel or new_box in layout.targets:
+                return node
+            next_box = (new_box[0] + d_row, new_box[1] + d_col)
+            if next_box not in layout.floor or next_box in node.boxes or next_box in layout.dead_squares:
+                return node
+            if is_freeze_deadlock(layout, node.boxes.difference((new_box,)).union((next_box,)), next_box):
+                return node
+            node = node.push(new_box, direction)
+        return node
+
+    def fill_room(self, node, room):
+        """Push the box on the entrance of the room to its next target, if the room is filled in order so far"""
+        inside = node.boxes & room.cells
+        filled = len(inside)
+        if filled >= len(room.order) or inside != set(room.order[:filled]):
+            return node
+        pushes = room.paths[filled].get(node.player)
+        if pushes is None:
+            return node
+        for box, direction in pushes:
+            node = node.push(box, direction)
+        return node
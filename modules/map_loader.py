@@ -0,0 +1,169 @@
+"""
+Map loading
+A map file contains one level written with the characters described in modules/game_state.py.
+This module does not depend on pygame, so the headless batch solver can use it.
+
+Collections in the standard .xsb/.sok formats hold many levels in one file. The levels are separated by blank lines,
+comments (';' lines) and text such as 'Title: ...'; '-' and '_' are accepted for the floor. iter_levels() reads a
+collection as a stream, one level at a time. load_level() opens level N in constant time through a byte-offset
+index built once per collection and saved next to it, or in INDEX_CACHE_DIRECTORY when the directory of the
+collection cannot be written (see get_index()). Files with a COLLECTION_EXTENSIONS extension are read as collections
+by batch.py and benchmark.py; any other map file is read as one level.
+
+Leading spaces are kept, since they place the walls of a line, and every level is padded with spaces into a
+rectangle, so that all its rows have the same width.
+"""
+
+import hashlib
+import os
+import struct
+
+LEVEL_CHARACTERS = set('#@+$*. -_')
+INDEX_HEADER = struct.Struct('<8sQQQ')  # Magic, size and modification time of the collection, number of levels
+INDEX_RECORD = struct.Struct('<QI')  # Byte offset and byte length of a level
+INDEX_MAGIC = b'SKIDX001'
+INDEX_CACHE_DIRECTORY = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'sokoban', 'index')
+COLLECTION_EXTENSIONS = ('.xsb', '.sok')
+
+
+def is_collection(path):
+    """Check if a file is a collection of levels, from its extension"""
+    return os.path.splitext(path)[1].lower() in COLLECTION_EXTENSIONS
+
+
+def is_level_line(line):
+    """Check if a line of a collection belongs to a level"""
+    return '#' in line and set(line) <= LEVEL_CHARACTERS
+
+
+def parse_level(lines):
+    """Turn the lines of one level into a rectangular map"""
+    rows = [line.replace('-', ' ').replace('_', ' ').rstrip() for line in lines]
+    width = max((len(row) for row in rows), default=0)
+    return [list(row.ljust(width)) for row in rows]
+
+
+def iter_level_spans(f):
+    """Read a binary collection file line by line and yield (offset, length, name) for every level.
+    The name is the last comment or title seen before the level, None if there is none."""
+    offset = 0
+    start = None
+    end = 0
+    name = None
+    for raw_line in f:
+        line = raw_line.decode('utf-8', errors='replace').rstrip('\r\n')
+        if is_level_line(line):
+            if start is None:
+                start = offset
+            end = offset + len(raw_line)
+        else:
+            if start is not None:
+                yield start, end - start, name
+                start = None
+                name = None
+            text = line.strip().lstrip(';').strip()
+            if text.lower().startswith('title:'):
+                text = text[len('title:'):].strip()
+            if text:
+                name = text
+        offset += len(raw_line)
+    if start is not None:
+        yield start, end - start, name
+
+
+def read_level(f, offset, length):
+    """Read and parse the level stored at the byte offset of a binary collection file"""
+    f.seek(offset)
+    return parse_level(f.read(length).decode('utf-8', errors='replace').splitlines())
+
+
+def iter_levels(collection_path):
+    """Yield (number, name, map) for every level of a collection, reading the file as a stream"""
+    with open(collection_path, 'rb') as f, open(collection_path, 'rb') as reader:
+        for number, (offset, length, name) in enumerate(iter_level_spans(f)):
+            yield number, name, read_level(reader, offset, length)
+
+
+def get_index_path(collection_path):
+    return collection_path + '.idx'
+
+
+def get_cached_index_path(collection_path):
+    """Get the path of the index of a collection in the cache directory, named after its absolute path"""
+    name = hashlib.sha256(os.path.abspath(collection_path).encode('utf-8')).hexdigest()[:32]
+    return os.path.join(INDEX_CACHE_DIRECTORY, name + '.idx')
+
+
+def is_valid_index(index_path, status):
+    """Check if an index exists and was built from the collection as it is now"""
+    if not os.path.exists(index_path):
+        return False
+    with open(index_path, 'rb') as f:
+        header = f.read(INDEX_HEADER.size)
+    if len(header) != INDEX_HEADER.size:
+        return False
+    magic, size, mtime, _ = INDEX_HEADER.unpack(header)
+    return magic == INDEX_MAGIC and size == status.st_size and mtime == status.st_mtime_ns
+
+
+def write_index(index_path, status, records):
+    """Write an index aside and rename it, so that a reader never sees a partial file"""
+    os.makedirs(os.path.dirname(index_path) or '.', exist_ok=True)
+    temporary_path = '{}.{}.tmp'.format(index_path, os.getpid())
+    try:
+        with open(temporary_path, 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, status.st_size, status.st_mtime_ns, len(records)))
+            f.writelines(records)
+        os.replace(temporary_path, index_path)
+    except OSError:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def get_index(collection_path):
+    """Get the path of the byte-offset index of a collection, building it if it is missing or older than the
+    collection. The index is a header followed by one fixed-size record per level. It is written next to the
+    collection, or in the cache directory when that fails (e.g. a read-only directory)."""
+    status = os.stat(collection_path)
+    index_paths = [get_index_path(collection_path), get_cached_index_path(collection_path)]
+    for index_path in index_paths:
+        if is_valid_index(index_path, status):
+            return index_path
+
+    with open(collection_path, 'rb') as f:
+        records = [INDEX_RECORD.pack(offset, length) for offset, length, _ in iter_level_spans(f)]
+    for index_path in index_paths:
+        try:
+            write_index(index_path, status, records)
+            return index_path
+        except OSError:
+            continue
+    raise Exception('Invalid collection: cannot write its index, ' + collection_path)
+
+
+def count_levels(collection_path):
+    """Get the number of levels of a collection from its index"""
+    with open(get_index(collection_path), 'rb') as f:
+        return INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))[3]
+
+
+def load_level(collection_path, number):
+    """Load level `number` (from 0) of a collection, reading only its record of the index and its own bytes"""
+    with open(get_index(collection_path), 'rb') as f:
+        count = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))[3]
+        if not 0 <= number < count:
+            raise Exception('Invalid level number')
+        f.seek(INDEX_HEADER.size + number * INDEX_RECORD.size)
+        offset, length = INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))
+    with open(collection_path, 'rb') as f:
+        return read_level(f, offset, length)
+
+
+def load_map(map_path):
+    """Load the map from the given path, the first level if the file is a collection"""
+    with open(map_path, 'rb') as f:
+        for offset, length, _ in iter_level_spans(f):
+            return read_level(f, offset, length)
+    raise Exception('Invalid map: no level in ' + map_path)
@@ -0,0 +1,91 @@
+"""
+Rendering helpers shared by the map preview and the solution playback
+- SpriteAtlas loads every sprite once, converts it to the display format and keeps one scaled copy per cell size.
+- get_cell_size() picks the largest cell size that fits a map in an area, up to the sprite size.
+- render_background() draws the static cells of a map (walls, floor and targets) into one surface.
+- render_map() draws a whole map, boxes and player included, on top of its background.
+The surfaces are converted, so the display mode must be set before using them.
+"""
+
+import os
+
+import pygame
+
+SPRITE_SIZE = 64  # Size of the images of the assets directory
+
+SPRITES = {
+    'wall': 'wall.png',
+    'floor': 'floor.png',
+    'target': 'target.png',
+    'box': 'box.png',
+    'box_on_target': 'crate_10.png',
+    'player_U': 'player_up.png',
+    'player_D': 'player_down.png',
+    'player_L': 'player_left.png',
+    'player_R': 'player_right.png',
+}
+
+
+class SpriteAtlas:
+    """Sprites loaded and converted once, scaled once per cell size"""
+
+    def __init__(self, assets_path='assets'):
+        self.assets_path = assets_path
+        self.images = {}  # Sprite name -> converted surface at its original size
+        self.scaled = {}  # (sprite name, cell size) -> converted surface scaled to the cell size
+
+    def get(self, name, cell_size=SPRITE_SIZE):
+        """Get the sprite scaled to cell_size x cell_size"""
+        sprite = self.scaled.get((name, cell_size))
+        if sprite is None:
+            image = self.images.get(name)
+            if image is None:
+                image = pygame.image.load(os.path.join(self.assets_path, SPRITES[name])).convert_alpha()
+                self.images[name] = image
+            sprite = image
+            if image.get_size() != (cell_size, cell_size):
+                sprite = pygame.transform.smoothscale(image, (cell_size, cell_size))
+            self.scaled[(name, cell_size)] = sprite
+        return sprite
+
+
+def get_cell_size(game_map, width, height, max_cell_size=SPRITE_SIZE):
+    """Get the largest cell size that fits the map in a width x height area"""
+    rows = len(game_map)
+    cols = max(len(row) for row in game_map)
+    return max(1, min(max_cell_size, width // cols, height // rows))
+
+
+def render_background(game_map, atlas, cell_size):
+    """Draw the walls, the floor and the targets of the map into a new surface"""
+    rows = len(game_map)
+    cols = max(len(row) for row in game_map)
+    background = pygame.Surface((cols * cell_size, rows * cell_size)).convert()
+    background.fill((0, 0, 0))
+    for row in range(rows):
+        for col in range(len(game_map[row])):
+            cell = game_map[row][col]
+            if cell == '#':
+                name = 'wall'
+            elif cell in ['.', '*', '+']:
+                name = 'target'
+            else:
+                name = 'floor'
+            background.blit(atlas.get(name, cell_size), (col * cell_size, row * cell_size))
+    return background
+
+
+def render_map(game_map, atlas, cell_size, background=None):
+    """Draw the whole map, boxes and player included, into a new surface"""
+    surface = (background or render_background(game_map, atlas, cell_size)).copy()
+    for row in range(len(game_map)):
+        for col in range(len(game_map[row])):
+            cell = game_map[row][col]
+            position = (col * cell_size, row * cell_size)
+            if cell == '$':
+                surface.blit(atlas.get('box', cell_size), position)
+            elif cell == '*':
+                surface.blit(atlas.get('box_on_target', cell_size), position)
+            elif cell in ['@', '+']:
+                surface.blit(atlas.get('player_U', cell_size), position)
+    return surface
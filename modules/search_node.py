@@ -0,0 +1,368 @@
+"""
+Compact search node used by the solver
+The GameState class keeps a full copy of the 2D map, which is convenient for drawing but expensive to copy for
+every successor. The solver works on SearchNode objects instead:
+- Layout: the static part of a level (walls, floor and targets). It is built once per level and shared by every node.
+- SearchNode: the dynamic part of a level, i.e. the player position and a frozenset of box positions.
+Generating a successor only rebuilds the box set, so it costs O(boxes) instead of O(width x height).
+The positions are tuples (row, column), like in GameState.
+Each node also carries the Zobrist hash of its box set, updated in O(1) per push, which the transposition table
+uses as its key.
+
+The solver searches over box pushes rather than single player steps. Two nodes with the same boxes whose players
+stand in the same open region are the same state, so a node is identified by its box set and the canonical
+(top-left) cell of the region the player can reach. get_pushes() emits one successor per legal push and
+walk_path() turns a push back into the U/D/L/R steps the visualization replays.
+Pushes onto the dead squares of the layout, or pushes that freeze a box outside a target, are never emitted
+(see modules/deadlock.py).
+The bidirectional strategy also searches backward from the solved nodes of get_goal_nodes(). get_pulls() and pull()
+are the reverse of get_pushes() and push(): a pulled node records, as its last_push, the push that undoes the pull.
+"""
+
+import itertools
+import random
+from collections import deque
+from modules.deadlock import find_dead_squares, is_freeze_deadlock
+from modules.heuristics import compute_nearest_distances, compute_push_distances
+
+DIRECTIONS = {
+    'U': (-1, 0),
+    'D': (1, 0),
+    'L': (0, -1),
+    'R': (0, 1),
+}
+
+OPPOSITE = {'U': 'D', 'D': 'U', 'L': 'R', 'R': 'L'}
+
+
+ZOBRIST_SEED = 20240321
+
+
+class Layout:
+    __slots__ = ('width', 'height', 'walls', 'floor', 'targets', 'target_list', 'neighbors', 'dead_squares',
+                 'push_distances', 'nearest_manhattan', 'nearest_push', 'zobrist_boxes', 'zobrist_player',
+                 'pattern_database')
+
+    def __init__(self, width, height, walls, floor, targets):
+        self.width = width
+        self.height = height
+        self.walls = frozenset(walls)
+        self.floor = frozenset(floor)
+        self.targets = frozenset(targets)
+        self.target_list = sorted(self.targets)
+
+        # Floor neighbours of every floor cell, with the direction that leads there
+        self.neighbors = {}
+        for row, col in self.floor:
+            self.neighbors[(row, col)] = [
+                (direction, (row + d_row, col + d_col))
+                for direction, (d_row, d_col) in DIRECTIONS.items()
+                if (row + d_row, col + d_col) in self.floor
+            ]
+
+        # Cells from which a box can never reach a target, computed once per level
+        self.dead_squares = find_dead_squares(self.floor, self.targets)
+
+        # Pushes needed to bring a box from every floor cell to each target of target_list, computed once per level
+        self.push_distances = compute_push_distances(self.floor, self.target_list)
+        self.nearest_manhattan, self.nearest_push = compute_nearest_distances(
+            self.floor, self.target_list, self.push_distances)
+
+        # One random 64-bit key per floor cell for a box and for the player, seeded so hashes are reproducible
+        rng = random.Random(ZOBRIST_SEED)
+        cells = sorted(self.floor)
+        self.zobrist_boxes = {cell: rng.getrandbits(64) for cell in cells}
+        self.zobrist_player = {cell: rng.getrandbits(64) for cell in cells}
+
+        self.pattern_database = None  # Loaded by the 'pdb' heuristics the first time they need it
+
+    def hash_boxes(self, boxes):
+        """Compute the Zobrist hash of a set of box positions from scratch"""
+        box_hash = 0
+        for box in boxes:
+            box_hash ^= self.zobrist_boxes[box]
+        return box_hash
+
+    @classmethod
+    def from_map(cls, game_map):
+        """Build the static layout from a 2D map of characters.
+        Only the cells the player can walk to, boxes aside, are floor: the padding outside the walls is not. The cell
+        of a box is floor as well, even in a pocket the player cannot reach, where the box can then never move."""
+        walls = set()
+        floor = set()
+        targets = set()
+        boxes = set()
+        player = None
+        for row, line in enumerate(game_map):
+            for col, char in enumerate(line):
+                if char == '#':
+                    walls.add((row, col))
+                    continue
+                floor.add((row, col))
+                if char in ['.', '*', '+']:
+                    targets.add((row, col))
+                if char in ['@', '+']:
+                    player = (row, col)
+                if char in ['$', '*']:
+                    boxes.add((row, col))
+
+        if player is not None:
+            inside = {player}
+            stack = [player]
+            while stack:
+                row, col = stack.pop()
+                for d_row, d_col in DIRECTIONS.values():
+                    cell = (row + d_row, col + d_col)
+                    if cell in floor and cell not in inside:
+                        inside.add(cell)
+                        stack.append(cell)
+            floor = inside | boxes
+            targets &= floor
+        width = max((len(line) for line in game_map), default=0)
+        return cls(width, len(game_map), walls, floor, targets)
+
+
+class SearchNode:
+    __slots__ = ('layout', 'player', 'boxes', 'box_hash', 'current_cost', 'parent', 'last_push', 'canonical_player',
+                 'heuristic_value', 'heuristic_data')
+
+    def __init__(self, layout, player, boxes, current_cost=0, box_hash=None, parent=None, last_push=None):
+        self.layout = layout
+        self.player = player
+        self.boxes = boxes
+        self.box_hash = layout.hash_boxes(boxes) if box_hash is None else box_hash
+        self.current_cost = current_cost
+        self.parent = parent  # Node this one was pushed from, the solver rebuilds the solution from these
+        self.last_push = last_push  # The (box, direction) push that led from the parent to this node
+        self.canonical_player = None  # Top-left cell of the player region, computed lazily by get_region()
+        self.heuristic_value = None  # Cached by the solver, see modules/heuristics.py
+        self.heuristic_data = None
+
+    @classmethod
+    def from_state(cls, state, layout=None):
+        """Build the root node of a search from a GameState"""
+        if layout is None:
+            layout = Layout.from_map(state.map)
+        return cls(layout, state.player, frozenset(state.boxes), state.current_cost)
+
+    def hash(self):
+        """Generate the Zobrist hash of the node: the box set combined with the normalized player region."""
+        return self.box_hash ^ self.layout.zobrist_player[self.get_canonical_player()]
+
+    def key(self):
+        """Return the exact identity of the node, used to detect Zobrist collisions"""
+        return self.get_canonical_player(), self.boxes
+
+    def __lt__(self, other):
+        return self.get_current_cost() < other.get_current_cost()
+
+    def __hash__(self):
+        return self.hash()
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, SearchNode) and
+            self.boxes == other.boxes and
+            self.get_canonical_player() == other.get_canonical_player()
+        )
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # The following methods are used to check if a position is a wall, box, target, or empty space
+    # The position is a tuple (row, column)
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def is_wall(self, position):
+        """Check if the given position is a wall"""
+        return position not in self.layout.floor
+
+    def is_box(self, position):
+        """Check if the given position is a box"""
+        return position in self.boxes
+
+    def is_target(self, position):
+        """Check if the given position is a target"""
+        return position in self.layout.targets
+
+    def is_empty(self, position):
+        """Check if a position is empty or a target."""
+        return position in self.layout.floor and position not in self.boxes
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # The following methods are used to find where the player can walk without pushing a box
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def get_region(self):
+        """Flood-fill the cells the player can reach without pushing a box.
+        The region is not kept on the node, only its canonical cell: the nodes waiting in a frontier would hold a set
+        of cells each, for a region only needed again when the node is expanded."""
+        neighbors = self.layout.neighbors
+        boxes = self.boxes
+        region = {self.player}
+        stack = [self.player]
+        while stack:
+            cell = stack.pop()
+            for _, next_cell in neighbors[cell]:
+                if next_cell not in region and next_cell not in boxes:
+                    region.add(next_cell)
+                    stack.append(next_cell)
+        self.canonical_player = min(region)
+        return region
+
+    def get_canonical_player(self):
+        """Get the top-left cell of the player region, which identifies the region"""
+        if self.canonical_player is None:
+            self.get_region()
+        return self.canonical_player
+
+    def walk_path(self, goal):
+        """Find the shortest list of steps that takes the player to the goal without pushing a box"""
+        neighbors = self.layout.neighbors
+        parents = {self.player: None}
+        queue = deque([self.player])
+        while queue:
+            cell = queue.popleft()
+            if cell == goal:
+                break
+            for direction, next_cell in neighbors[cell]:
+                if next_cell not in parents and next_cell not in self.boxes:
+                    parents[next_cell] = (cell, direction)
+                    queue.append(next_cell)
+        if goal not in parents:
+            return None
+
+        steps = []
+        cell = goal
+        while parents[cell] is not None:
+            cell, direction = parents[cell]
+            steps.append(direction)
+        steps.reverse()
+        return steps
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # The following methods get heuristics for the node (for informed search strategies)
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def get_heuristic(self):
+        """Get the heuristic for the node"""
+        heuristic = 0
+        for box in self.boxes:
+            min_distance = float('inf')
+            for target in self.layout.targets:
+                distance = abs(box[0] - target[0]) + abs(box[1] - target[1])
+                min_distance = min(min_distance, distance)
+            heuristic += min_distance
+        return heuristic
+
+    def get_total_cost(self):
+        """Get the cost for the node"""
+        return self.current_cost + self.get_heuristic()
+
+    def get_current_cost(self):
+        """Get the current cost for the node"""
+        return self.current_cost
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # The following methods are used to generate the next node and check if the game is solved
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def move(self, direction):
+        """Generate the next node by moving the player in the given direction.
+        If the move is blocked the node itself is returned, like GameState.move returns an unchanged copy."""
+        d_row, d_col = DIRECTIONS[direction]
+        row, col = self.player
+        new_player = (row + d_row, col + d_col)
+
+        if self.is_empty(new_player):
+            return SearchNode(self.layout, new_player, self.boxes, self.current_cost + 1, self.box_hash)
+
+        if self.is_box(new_player):
+            new_box = (new_player[0] + d_row, new_player[1] + d_col)
+            if self.is_empty(new_box):
+                boxes = self.boxes.difference((new_player,)).union((new_box,))
+                zobrist = self.layout.zobrist_boxes
+                box_hash = self.box_hash ^ zobrist[new_player] ^ zobrist[new_box]
+                return SearchNode(self.layout, new_player, boxes, self.current_cost + 1, box_hash)
+
+        return self
+
+    def get_pushes(self):
+        """Get every legal push that does not create a deadlock, as a (box, direction) pair"""
+        region = self.get_region()
+        layout = self.layout
+        floor = layout.floor
+        dead_squares = layout.dead_squares
+        boxes = self.boxes
+        pushes = []
+        for box in boxes:
+            row, col = box
+            for direction, (d_row, d_col) in DIRECTIONS.items():
+                new_box = (row + d_row, col + d_col)
+                if (row - d_row, col - d_col) not in region or new_box not in floor or new_box in boxes:
+                    continue
+                if new_box in dead_squares:
+                    continue
+                if is_freeze_deadlock(layout, boxes.difference((box,)).union((new_box,)), new_box):
+                    continue
+                pushes.append((box, direction))
+        return pushes
+
+    def push(self, box, direction):
+        """Generate the next node by pushing the given box in the given direction.
+        The player ends up where the box was; the push costs 1. The new node keeps a reference to this one."""
+        d_row, d_col = DIRECTIONS[direction]
+        new_box = (box[0] + d_row, box[1] + d_col)
+        boxes = self.boxes.difference((box,)).union((new_box,))
+        zobrist = self.layout.zobrist_boxes
+        box_hash = self.box_hash ^ zobrist[box] ^ zobrist[new_box]
+        return SearchNode(self.layout, box, boxes, self.current_cost + 1, box_hash, self, (box, direction))
+
+    def check_solved(self):
+        """Check if the game is solved"""
+        return self.boxes <= self.layout.targets
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # The following methods are used by the backward search, from the solved nodes to the start
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def get_goal_nodes(self):
+        """Get the solved nodes with as many boxes as this node: the boxes on the targets, with one node per region
+        the player can stand in"""
+        layout = self.layout
+        nodes = []
+        for targets in itertools.combinations(layout.target_list, len(self.boxes)):
+            boxes = frozenset(targets)
+            covered = set()
+            for cell in sorted(layout.floor - boxes):
+                if cell not in covered:
+                    node = SearchNode(layout, cell, boxes)
+                    covered |= node.get_region()
+                    nodes.append(node)
+        return nodes
+
+    def get_pulls(self):
+        """Get every legal pull as a (box, direction) pair: the player stands next to the box on the side of the
+        direction and steps back that way, dragging the box one cell along"""
+        region = self.get_region()
+        floor = self.layout.floor
+        boxes = self.boxes
+        pulls = []
+        for box in boxes:
+            row, col = box
+            for direction, (d_row, d_col) in DIRECTIONS.items():
+                new_box = (row + d_row, col + d_col)
+                new_player = (row + 2 * d_row, col + 2 * d_col)
+                if new_box in region and new_player in floor and new_player not in boxes:
+                    pulls.append((box, direction))
+        return pulls
+
+    def pull(self, box, direction):
+        """Generate the previous node by pulling the given box in the given direction.
+        The new node keeps a reference to this one and, as last_push, the push that leads back to this one."""
+        d_row, d_col = DIRECTIONS[direction]
+        new_box = (box[0] + d_row, box[1] + d_col)
+        new_player = (new_box[0] + d_row, new_box[1] + d_col)
+        boxes = self.boxes.difference((box,)).union((new_box,))
+        zobrist = self.layout.zobrist_boxes
+        box_hash = self.box_hash ^ zobrist[box] ^ zobrist[new_box]
+        return SearchNode(self.layout, new_player, boxes, self.current_cost + 1, box_hash, self,
+                          (new_box, OPPOSITE[direction]))
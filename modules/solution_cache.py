@@ -0,0 +1,140 @@
+"""
+Persistent solution cache
+Solving a level again with the same configuration gives the same answer, so main.py keeps the answers in a small
+SQLite file. An entry is keyed by:
+- the canonical text of the level: the floor outside the outer walls is blanked, trailing spaces, blank outer lines
+  and the indentation shared by every line are removed, so the same level written differently has the same key,
+- the strategy, the heuristic and any other solver option that changes the answer.
+It stores the U/D/L/R moves (None for an unsolvable level) and the statistics of the search that found them.
+Only searches that finished are stored, never one that gave up on a limit.
+get() replays a cached solution on the level before returning it and drops the entry if it no longer solves it.
+When the file grows over max_bytes, the least recently used entries are evicted.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from modules.game_state import GameState
+
+CACHE_PATH = '.solution_cache.sqlite3'
+CACHED_STATS = ['status', 'expanded_states', 'generated_states', 'runtime']  # Statistics kept with a solution
+
+
+def canonical_level(game_map):
+    """Get the canonical text of a level"""
+    height = len(game_map)
+    width = max((len(row) for row in game_map), default=0)
+    grid = [list(row) + [' '] * (width - len(row)) for row in game_map]
+
+    # Blank the cells reachable from the border without crossing a wall
+    outside = set()
+    stack = [(row, col) for row in range(height) for col in range(width)
+             if row in (0, height - 1) or col in (0, width - 1)]
+    while stack:
+        row, col = stack.pop()
+        if not (0 <= row < height and 0 <= col < width) or (row, col) in outside or grid[row][col] == '#':
+            continue
+        outside.add((row, col))
+        stack.extend([(row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)])
+    for row, col in outside:
+        grid[row][col] = ' '
+
+    lines = [''.join(row).rstrip() for row in grid]
+    while lines and not lines[0]:
+        lines.pop(0)
+    while lines and not lines[-1]:
+        lines.pop()
+    indent = min((len(line) - len(line.lstrip(' ')) for line in lines if line), default=0)
+    return '\n'.join(line[indent:] for line in lines)
+
+
+def get_key(game_map, strategy, heuristic, config=None):
+    """Get the cache key of a level solved with a configuration"""
+    text = json.dumps([canonical_level(game_map), strategy, heuristic, config or {}], sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def replays(game_map, moves):
+    """Check that the moves solve the level"""
+    lines = canonical_level(game_map).split('\n')
+    width = max(len(line) for line in lines)
+    state = GameState([list(line.ljust(width)) for line in lines])
+    for direction in moves:
+        next_state = state.move(direction)
+        if next_state.map == state.map:
+            return False  # The move is blocked, the solution is for another level
+        state = next_state
+    return state.check_solved()
+
+
+class SolutionCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=16 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        with self.connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS solutions ('
+                'key TEXT PRIMARY KEY, moves TEXT, stats TEXT NOT NULL, size INTEGER NOT NULL, '
+                'last_used REAL NOT NULL)')
+
+    @contextmanager
+    def connect(self):
+        """Open a connection for one transaction, so that the cache can be used from any thread"""
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, game_map, strategy, heuristic, config=None):
+        """Get the (moves, stats) cached for the level, or None.
+        The moves are a list of directions, or None when the level was found unsolvable."""
+        key = get_key(game_map, strategy, heuristic, config)
+        with self.connect() as connection:
+            row = connection.execute('SELECT moves, stats FROM solutions WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            moves, stats = row
+            moves = None if moves is None else list(moves)
+            if moves is not None and not replays(game_map, moves):
+                connection.execute('DELETE FROM solutions WHERE key = ?', (key,))
+                return None
+            connection.execute('UPDATE solutions SET last_used = ? WHERE key = ?', (time.time(), key))
+        return moves, json.loads(stats)
+
+    def put(self, game_map, strategy, heuristic, moves, stats, config=None):
+        """Store the moves and the statistics of a finished search"""
+        if stats.get('status') not in ('solved', 'unsolvable'):
+            return  # The search gave up, another run may do better
+        key = get_key(game_map, strategy, heuristic, config)
+        moves = None if moves is None else ''.join(moves)
+        stats = json.dumps({name: stats.get(name) for name in CACHED_STATS})
+        size = len(key) + len(moves or '') + len(stats)
+        with self.connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?)',
+                               (key, moves, stats, size, time.time()))
+            self.evict(connection)
+
+    def evict(self, connection):
+        """Delete the least recently used entries until the stored size fits in max_bytes"""
+        total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM solutions').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in connection.execute('SELECT key, size FROM solutions ORDER BY last_used').fetchall():
+            connection.execute('DELETE FROM solutions WHERE key = ?', (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        """Delete every entry"""
+        with self.connect() as connection:
+            connection.execute('DELETE FROM solutions')
+
+    def __len__(self):
+        with self.connect() as connection:
+            return connection.execute('SELECT COUNT(*) FROM solutions').fetchone()[0]
@@ -2,36 +2,247 @@ from collections import deque
 import time
 from copy import deepcopy
 import heapq
+import multiprocessing
+import os
+import queue
 from functools import wraps
+from modules.search_node import DIRECTIONS, SearchNode
+from modules.bitboard import BitState
+from modules.transposition import TranspositionTable
+from modules.heuristics import INFINITY, get_heuristic_function
+from modules.instrumentation import Instrumentation, get_peak_rss_kb, get_rss_kb
+from modules.macros import MacroMoves
+from modules.bucket_queue import BucketQueue
+from modules.external_bfs import DEFAULT_BUFFER_SIZE, ExternalBFS
+
+STRATEGIES = ['bfs', 'dfs', 'astar', 'idastar', 'ucs', 'greedy', 'custom', 'bidirectional', 'portfolio']
+INFORMED_STRATEGIES = ['astar', 'idastar', 'greedy', 'custom']  # The strategies that use a heuristic
+BACKENDS = ['node', 'bitboard']  # Level representations; bitboard only runs bfs and dfs (see modules/bitboard.py)
+FRONTIERS = ['heap', 'bucket']  # Open lists of astar, ucs, greedy and custom (see modules/bucket_queue.py)
+
+# Strategy and heuristic configurations run side by side by the portfolio strategy
+PORTFOLIO = [
+    ('astar', 'matching'),
+    ('idastar', 'matching'),
+    ('greedy', 'matching'),
+    ('astar', 'push_distance'),
+    ('greedy', 'push_distance'),
+    ('bfs', 'manhattan'),
+]
+PORTFOLIO_STOP_GRACE = 2  # Seconds the stopped portfolio workers have to send their partial statistics
+
+# Statuses of a search that gave up before it could prove the level solved or unsolvable
+LIMIT_STATUSES = ['time_limit', 'node_limit', 'memory_limit', 'cancelled']
+
+
+class SearchLimitReached(Exception):
+    """Raised inside a search when one of its limits is reached; the status is one of LIMIT_STATUSES"""
+
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+def report_stats(stats):
+    """Print the statistics of a finished search"""
+    result = stats['solution']
+    print("Status:", stats.get('status'))
+    print("Expanded state:", result)
+    print("Number of state generated:", stats['generated_states'])
+    print("Number of expanded nodes:", stats['expanded_states'])
+    print("Number of moves to reach target:", len(result) if result else None)
+    print("Transposition table:", stats['transposition_table'])
+    print("Runtime:", round(stats['runtime'], 4), "seconds")
+    if stats['expanded_states']:
+        print("Time per expansion:", round(stats['runtime'] * 1e6 / stats['expanded_states'], 2), "microseconds")
+    if stats.get('profile'):
+        print("Profile:", stats['profile'])
+
 
 def print_stats(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
+        args[0].start_search()
         start_time = time.time()
-        result = func(*args, **kwargs)
+        try:
+            result = func(*args, **kwargs)
+            status = 'solved' if result is not None else 'unsolvable'
+        except SearchLimitReached as limit:
+            result = None  # Give up, the statistics still describe the partial search
+            status = limit.status
         end_time = time.time()
 
-        print("Expanded state:", result)
-        print("Number of state generated:", args[0].generated_states)
-        print("Number of expanded nodes:", args[0].expanded_states)
-        print("Number of moves to reach target:", len(result) if result else None)
-        print("Runtime:", round(end_time - start_time, 4), "seconds")
+        args[0].stats = args[0].get_stats(result, end_time - start_time, status)
+        args[0].instrumentation.on_finish(args[0], args[0].stats)
+        if args[0].verbose:
+            report_stats(args[0].stats)
 
         return result
 
     return wrapper
 
 
+def solve_worker(worker, initial_state, strategy, heuristic, memory_budget, limits, results):
+    """Run one configuration of the portfolio in a worker process and send its statistics back.
+    limits holds the time_limit, node_limit, memory_limit and cancel_token keyword arguments of the worker Solver."""
+    start_time = time.time()
+    try:
+        solver = Solver(initial_state, strategy, heuristic, memory_budget, **limits)
+        solver.verbose = False
+        solver.solve()
+        stats = solver.stats
+    except Exception as error:
+        stats = {
+            'strategy': strategy,
+            'heuristic': heuristic,
+            'solution': None,
+            'status': 'error',
+            'generated_states': 0,
+            'expanded_states': 0,
+            'transposition_table': {},
+            'runtime': time.time() - start_time,
+            'error': repr(error),
+        }
+    stats['worker'] = worker
+    results.put(stats)
+
+
 class Solver(object):
-    def __init__(self, initial_state, strategy):
+    def __init__(self, initial_state, strategy, heuristic='manhattan', memory_budget=100000, portfolio=None,
+                 deadline=None, workers=None, instrumentation=None, time_limit=None, node_limit=None,
+                 memory_limit=None, cancel_token=None, macros=True,
+                 frontier='heap', external_memory=False, buffer_size=DEFAULT_BUFFER_SIZE, spill_directory=None,
+                 backend='node'):
         self.initial_state = initial_state
+        self.initial_node = SearchNode.from_state(initial_state)
         self.strategy = strategy
+        self.heuristic_name = heuristic
+        self.heuristic = get_heuristic_function(heuristic)  # Used by astar, idastar, greedy and custom
+        if backend not in BACKENDS:
+            raise Exception('Invalid backend')
+        if backend == 'bitboard' and (strategy not in ('bfs', 'dfs') or external_memory):
+            raise Exception('Invalid backend: the bitboard backend only runs bfs and dfs, in memory')
+        self.backend = backend
+        self.root = BitState.from_state(initial_state) if backend == 'bitboard' else self.initial_node  # Of bfs, dfs
+        # Tunnel and goal room macro moves, only on the SearchNode backend
+        self.macros = MacroMoves(self.initial_node) if macros and backend == 'node' else None
+        self.memory_budget = memory_budget  # Maximum number of states idastar keeps in its transposition table
+        self.portfolio_configs = PORTFOLIO if portfolio is None else portfolio  # (strategy, heuristic) pairs
+        self.deadline = deadline  # Seconds the portfolio waits for the best solution, None returns the first one
+        self.workers = workers or os.cpu_count() or 1  # Number of portfolio worker processes
+
+        # External-memory bfs: layers on disk, at most buffer_size successors in memory (see modules/external_bfs.py)
+        self.external_memory = external_memory
+        self.buffer_size = buffer_size
+        self.spill_directory = spill_directory  # Directory of the work files, None for the system temporary directory
+
+        # Limits after which a search gives up, each None for no limit
+        self.time_limit = time_limit  # Seconds
+        self.node_limit = node_limit  # Expanded nodes
+        self.memory_limit = memory_limit  # Megabytes of resident memory of the process
+        self.cancel_token = cancel_token  # Any object with is_set(), e.g. a threading.Event set from another thread
+        self.stop_time = None
+        self.verbose = True  # Print the statistics of every search
+        self.stats = None
+        self.worker_stats = []
         self.solution = None
         self.time = None
-        self.expanded_states = 0  # Initialize expanded_states attribute
-        self.generated_states = 0  # Initialize generated_states attribute
+        self.expanded_states = 0  # Nodes whose successors were generated
+        self.generated_states = 0  # Successors added to the frontier
+        self.best_heuristic = INFINITY  # Lowest heuristic value computed so far
+        self.best_total_cost = None  # f = g + h of the last node expanded by astar and idastar
+        if frontier not in FRONTIERS:
+            raise Exception('Invalid frontier')
+        self.frontier = frontier
+        if frontier == 'bucket':
+            self.frontier_push = BucketQueue.push  # Frontier operations of the informed strategies
+            self.frontier_pop = BucketQueue.pop
+        else:
+            self.frontier_push = heapq.heappush
+            self.frontier_pop = heapq.heappop
+
+        # Progress reports and optional profiling of the hot paths
+        self.instrumentation = Instrumentation() if instrumentation is None else instrumentation
+        self.profiler = self.instrumentation.profiler
+        if self.profiler is not None:
+            self.get_legal_actions = self.profiler.wrap('successors', self.get_legal_actions)
+            self.get_next_state = self.profiler.wrap('successors', self.get_next_state)
+            self.heuristic = self.profiler.wrap('heuristic', self.heuristic)
+            self.frontier_push = self.profiler.wrap('frontier', self.frontier_push)
+            self.frontier_pop = self.profiler.wrap('frontier', self.frontier_pop)
+        self.start_time = None
+        self.next_progress_time = None
+        self.transposition_table = self.new_transposition_table()  # Shared by every strategy to detect repeated states
+
+    def new_transposition_table(self, max_entries=None):
+        """Create a transposition table, profiled if the instrumentation has a profiler."""
+        table = TranspositionTable(max_entries)
+        if self.profiler is not None:
+            table.insert = self.profiler.wrap('hashing', table.insert)
+            table.is_stale = self.profiler.wrap('hashing', table.is_stale)
+        return table
+
+    def new_frontier(self, entry):
+        """Create the open list of astar, ucs, greedy or custom, holding the (cost, node) entry of the root.
+        The bucket queue breaks the ties of A* on the lower heuristic."""
+        if self.frontier == 'bucket':
+            open_list = BucketQueue('h' if self.strategy == 'astar' else None)
+        else:
+            open_list = []
+        self.frontier_push(open_list, entry)
+        return open_list
+
+    def start_search(self):
+        """Reset the progress clock at the start of a search."""
+        self.start_time = time.time()
+        self.next_progress_time = self.start_time + self.instrumentation.interval
+        self.stop_time = None if self.time_limit is None else self.start_time + self.time_limit
+        self.instrumentation.on_start(self)
+
+    def count_expansion(self, frontier_size, total_cost=None):
+        """Count an expanded node, check the limits of the search and report the progress when it is due.
+        Raise SearchLimitReached when a limit is reached."""
+        if self.node_limit is not None and self.expanded_states >= self.node_limit:
+            raise SearchLimitReached('node_limit')
+        self.expanded_states += 1
+        if total_cost is not None:
+            self.best_total_cost = total_cost
+        if self.expanded_states & 63 == 0:
+            self.check_limits()
+        if self.expanded_states & 255 == 0 and time.time() >= self.next_progress_time:
+            self.next_progress_time = time.time() + self.instrumentation.interval
+            self.instrumentation.on_progress(self, self.get_progress(frontier_size))
+
+    def check_limits(self):
+        """Raise SearchLimitReached if the search was cancelled or is over its time or memory limit.
+        It is called every 64 expansions; the memory, slower to measure, is only checked every 1024."""
+        if self.cancel_token is not None and self.cancel_token.is_set():
+            raise SearchLimitReached('cancelled')
+        if self.stop_time is not None and time.time() >= self.stop_time:
+            raise SearchLimitReached('time_limit')
+        if self.memory_limit is not None and self.expanded_states & 1023 == 0:
+            rss = get_rss_kb()
+            if rss is not None and rss >= self.memory_limit * 1024:
+                raise SearchLimitReached('memory_limit')
+
+    def get_progress(self, frontier_size):
+        """Describe the progress of the running search."""
+        elapsed = time.time() - self.start_time
+        return {
+            'elapsed': elapsed,
+            'expanded_states': self.expanded_states,
+            'generated_states': self.generated_states,
+            'nodes_per_second': self.expanded_states / elapsed if elapsed > 0 else 0.0,
+            'frontier_size': frontier_size,
+            'closed_size': len(self.transposition_table),
+            'best_total_cost': self.best_total_cost,
+            'best_heuristic': self.best_heuristic,
+            'peak_rss_kb': get_peak_rss_kb(),
+        }
 
     def solve(self):
+        """Run the search and return its statistics. The 'status' of the statistics is 'solved', 'unsolvable', or
+        one of LIMIT_STATUSES when the search gave up; get_solution() is then None."""
         start_time = time.time()
         if self.strategy == 'bfs':
             self.solution = self.bfs()
@@ -39,38 +250,47 @@ class Solver(object):
             self.solution = self.dfs()
         elif self.strategy == 'astar':
             self.solution = self.astar()
+        elif self.strategy == 'idastar':
+            self.solution = self.idastar()
         elif self.strategy == 'ucs':
             self.solution = self.ucs()
         elif self.strategy == 'greedy':
             self.solution = self.greedy()
         elif self.strategy == 'custom':
             self.solution = self.custom()
+        elif self.strategy == 'bidirectional':
+            self.solution = self.bidirectional()
+        elif self.strategy == 'portfolio':
+            self.solution = self.portfolio()
         else:
             raise Exception('Invalid strategy')
         self.time = time.time() - start_time
+        return self.stats
 
     @print_stats
     def bfs(self):
-        visited_states = set()
-        queue = deque([(self.initial_state, [])])
+        if self.external_memory:
+            pushes = ExternalBFS(self, self.spill_directory, self.buffer_size).search()
+            return None if pushes is None else self.expand_pushes(pushes)
+
+        visited_states = self.transposition_table
+        queue = deque([self.root])
+        visited_states.insert(self.root)
 
         while queue:
-            current_state, path = queue.popleft()
-            self.expanded_states += 1
+            current_state = queue.popleft()
 
             if self.is_goal_state(current_state):
-                return path
+                return self.get_moves(current_state)
 
-            visited_states.add(current_state.hash())  # Add current state's hash to visited
+            self.count_expansion(len(queue))
 
             for action in self.get_legal_actions(current_state):
                 next_state = self.get_next_state(current_state, action)
 
                 # Check if the next state has been visited or is in the queue
-                next_state_hash = next_state.hash()
-                if next_state_hash not in visited_states:
-                    queue.append((next_state, path + [action]))
-                    visited_states.add(next_state_hash)  # Add next state's hash to visited
+                if visited_states.insert(next_state):
+                    queue.append(next_state)
 
                     # Increment generated states only if the state is not visited
                     self.generated_states += 1
@@ -82,48 +302,78 @@ class Solver(object):
         return state.check_solved()
 
     def get_legal_actions(self, state):
-        posPlayer = state.find_player()
-        posBox = state.find_boxes()
-        all_actions = [[-1, 0, 'U'], [1, 0, 'D'], [0, -1, 'L'], [0, 1, 'R']]
-        legal_actions = []
-
-        for action in all_actions:
-            new_pos_player = (posPlayer[0] + action[0], posPlayer[1] + action[1])
-            new_pos_box = (new_pos_player[0] + action[0], new_pos_player[1] + action[1])
-
-            if (
-                state.is_empty(new_pos_player)
-                or (state.is_box(new_pos_player) and state.is_empty(new_pos_box))
-            ):
-                legal_actions.append(action[2])
-
-        return legal_actions
+        """Get the legal box pushes from the state as (box, direction) pairs."""
+        return state.get_pushes()
 
     def get_next_state(self, state, action):
-        """Generate the next state based on the action taken."""
-        return state.move(action)
+        """Generate the next state based on the push taken, extended by the macro moves that follow it."""
+        box, direction = action
+        next_state = state.push(box, direction)
+        if self.macros is not None:
+            next_state = self.macros.extend(next_state)
+        return next_state
+
+    def evaluate(self, state, parent=None, action=None):
+        """Get the selected heuristic for the state and cache it on the state.
+        When the parent and the push that led to the state are given, the value is derived from the parent's.
+        A macro move pushes the same box several times, so the box ends where the last push of the state left it."""
+        if state.heuristic_value is None:
+            moved = None
+            if action is not None:
+                last_box, direction = state.last_push
+                d_row, d_col = DIRECTIONS[direction]
+                moved = (action[0], (last_box[0] + d_row, last_box[1] + d_col))
+            state.heuristic_value = self.heuristic(state, parent, moved)
+            if state.heuristic_value < self.best_heuristic:
+                self.best_heuristic = state.heuristic_value
+        return state.heuristic_value
+
+    def get_total_cost(self, state, parent=None, action=None):
+        """Get the cost so far plus the selected heuristic for the state."""
+        return state.get_current_cost() + self.evaluate(state, parent, action)
+
+    def get_moves(self, state):
+        """Rebuild the pushes that led to the state by following the parent references, then expand them into the
+        U/D/L/R steps of the player."""
+        pushes = []
+        while state.parent is not None:
+            pushes.append(state.last_push)
+            state = state.parent
+        pushes.reverse()
+        if self.backend == 'bitboard':
+            pushes = [(state.layout.get_position(box), direction) for box, direction in pushes]
+        return self.expand_pushes(pushes)
+
+    def expand_pushes(self, pushes):
+        """Expand pushes from the initial node into U/D/L/R steps, walking to each box before pushing it."""
+        moves = []
+        state = self.initial_node
+        for box, direction in pushes:
+            d_row, d_col = DIRECTIONS[direction]
+            moves.extend(state.walk_path((box[0] - d_row, box[1] - d_col)))
+            moves.append(direction)
+            state = state.push(box, direction)
+        return moves
 
     @print_stats
     def dfs(self):
-        stack = [(self.initial_state, [])]
-        visited_states = set()
+        stack = [self.root]
+        visited_states = self.transposition_table
+        visited_states.insert(self.root)
 
         while stack:
-            current_state, path = stack.pop()
-            self.expanded_states += 1
+            current_state = stack.pop()
 
             if current_state.check_solved():
-                return path
+                return self.get_moves(current_state)
 
-            visited_states.add(current_state.hash())
+            self.count_expansion(len(stack))
 
             for action in self.get_legal_actions(current_state):
                 next_state = self.get_next_state(current_state, action)
 
-                next_state_hash = next_state.hash()
-                if next_state_hash not in visited_states:
-                    stack.append((next_state, path + [action]))
-                    visited_states.add(next_state_hash)
+                if visited_states.insert(next_state):
+                    stack.append(next_state)
                     self.generated_states += 1
 
         return None
@@ -131,121 +381,175 @@ class Solver(object):
 
     @print_stats
     def astar(self):
-        open_list = [(self.initial_state.get_total_cost(), self.initial_state, [])]
-        closed_set = set()  # Maintain a set of visited states
+        root_cost = self.get_total_cost(self.initial_node)
+        if root_cost == INFINITY:
+            return None  # A box of the root cannot reach any target
+        open_list = self.new_frontier((root_cost, self.initial_node))
+        best_costs = self.transposition_table  # Best cost g found so far for every generated state
+        best_costs.insert(self.initial_node, self.initial_node.get_current_cost())
 
         while open_list:
-            _, current_state, path = heapq.heappop(open_list)
+            total_cost, current_state = self.frontier_pop(open_list)
 
             if current_state.check_solved():
-                return path
+                return self.get_moves(current_state)
 
-            current_state_hash = hash(current_state)
-            if current_state_hash in closed_set:
-                continue  # Skip if state has already been visited
+            if best_costs.is_stale(current_state, current_state.get_current_cost()):
+                continue  # Skip if a cheaper path to this state was found after it was pushed
 
-            closed_set.add(current_state_hash)  # Mark state as visited
+            self.count_expansion(len(open_list), total_cost)
 
-            for direction in ['U', 'D', 'L', 'R']:
-                next_state = current_state.move(direction)
-                next_state_hash = hash(next_state)
+            for action in self.get_legal_actions(current_state):
+                next_state = self.get_next_state(current_state, action)
 
-                if next_state_hash not in closed_set:
-                    new_cost = next_state.get_total_cost()
-                    heapq.heappush(open_list, (new_cost, next_state, path + [direction]))
+                if best_costs.insert(next_state, next_state.get_current_cost()):
+                    new_cost = self.get_total_cost(next_state, current_state, action)
+                    if new_cost == INFINITY:
+                        continue  # No target can be reached by one of the boxes
+                    self.frontier_push(open_list, (new_cost, next_state))
                     self.generated_states += 1
 
-            self.expanded_states += 1
+        return None
+
+    @print_stats
+    def idastar(self):
+        """Iterative deepening A*: depth-first searches bounded by f = g + h, raising the bound to the smallest f that
+        exceeded it after every iteration. Memory only grows with the depth of the search, plus a transposition
+        table of at most memory_budget states that is emptied at every iteration."""
+        self.transposition_table = self.new_transposition_table(self.memory_budget)
+        bound = self.get_total_cost(self.initial_node)
+
+        while bound != INFINITY:
+            self.transposition_table.clear()
+            self.transposition_table.insert(self.initial_node, self.initial_node.get_current_cost())
+            goal_state, bound = self.idastar_search(self.initial_node, bound)
+            if goal_state is not None:
+                return self.get_moves(goal_state)
 
         return None
 
+    def idastar_search(self, root, bound):
+        """Search below the root without exceeding the bound, depth first. The stack holds, for every depth, the
+        children still to visit, so the depth of a solution is not limited by the recursion limit of Python.
+        Return the goal state found, or None and the smallest f that exceeded the bound."""
+        next_bound = INFINITY
+        stack = [iter([(self.get_total_cost(root), root)])]
+        pending = 1  # Children on the stack not visited yet, reported as the frontier size
+        while stack:
+            entry = next(stack[-1], None)
+            if entry is None:
+                stack.pop()
+                continue
+            pending -= 1
+            total_cost, current_state = entry
+            if total_cost > bound:
+                next_bound = min(next_bound, total_cost)
+                continue
+            if current_state.check_solved():
+                return current_state, total_cost
+
+            self.count_expansion(pending, total_cost)
+            children = []
+            for action in self.get_legal_actions(current_state):
+                next_state = self.get_next_state(current_state, action)
+
+                # Skip the state if this iteration already explored it with a cost at most as high
+                if self.transposition_table.insert(next_state, next_state.get_current_cost()):
+                    new_cost = self.get_total_cost(next_state, current_state, action)
+                    if new_cost == INFINITY:
+                        continue  # No target can be reached by one of the boxes
+                    children.append((new_cost, next_state))
+                    self.generated_states += 1
+
+            children.sort(key=lambda child: child[0])  # Most promising children first
+            stack.append(iter(children))
+            pending += len(children)
+
+        return None, next_bound
+
     @print_stats
     def ucs(self):
-        open_list = [(self.initial_state.get_current_cost(), self.initial_state, [])]
-        heapq.heapify(open_list)
-        visited_states = set()  # Track visited states
+        open_list = self.new_frontier((self.initial_node.get_current_cost(), self.initial_node))
+        best_costs = self.transposition_table  # Best cost g found so far for every generated state
+        best_costs.insert(self.initial_node, self.initial_node.get_current_cost())
 
         while open_list:
-            current_cost, current_state, path = heapq.heappop(open_list)
+            current_cost, current_state = self.frontier_pop(open_list)
 
-            current_state_hash = hash(current_state)
-
-            if current_state_hash in visited_states:
-                continue  # Skip if state has been visited with a lower cost
-
-            visited_states.add(current_state_hash)
+            if best_costs.is_stale(current_state, current_cost):
+                continue  # Skip if state has been reached with a lower cost
 
             if current_state.check_solved():
-                return path
+                return self.get_moves(current_state)
 
-            for direction in ['U', 'D', 'L', 'R']:
-                next_state = current_state.move(direction)
-                next_cost = next_state.get_current_cost() + len(path)  # Calculate total cost
+            self.count_expansion(len(open_list), current_cost)
 
-                if hash(next_state) not in visited_states:
-                    heapq.heappush(open_list, (next_cost, next_state, path + [direction]))
-                    self.generated_states += 1
+            for action in self.get_legal_actions(current_state):
+                next_state = self.get_next_state(current_state, action)
+                next_cost = next_state.get_current_cost()
 
-            self.expanded_states += 1
+                if best_costs.insert(next_state, next_cost):
+                    self.frontier_push(open_list, (next_cost, next_state))
+                    self.generated_states += 1
 
         return None
 
 
     @print_stats
     def greedy(self):
-        open_list = [(self.initial_state.get_heuristic(), self.initial_state, [])]
-        closed_set = set()
+        root_heuristic = self.evaluate(self.initial_node)
+        if root_heuristic == INFINITY:
+            return None  # A box of the root cannot reach any target
+        open_list = self.new_frontier((root_heuristic, self.initial_node))
+        closed_set = self.transposition_table
+        closed_set.insert(self.initial_node)
 
         while open_list:
-            _, current_state, path = heapq.heappop(open_list)
+            _, current_state = self.frontier_pop(open_list)
 
             if current_state.check_solved():
-                return path
+                return self.get_moves(current_state)
 
-            current_state_hash = hash(current_state)
-            closed_set.add(current_state_hash)
+            self.count_expansion(len(open_list))
 
-            for direction in ['U', 'D', 'L', 'R']:
-                next_state = current_state.move(direction)
-                next_state_hash = hash(next_state)
-
-                if next_state_hash not in closed_set:
-                    heuristic_value = next_state.get_heuristic()
-                    heapq.heappush(open_list, (heuristic_value, next_state, path + [direction]))
+            for action in self.get_legal_actions(current_state):
+                next_state = self.get_next_state(current_state, action)
 
-            self.expanded_states += 1
-            self.generated_states += 1
+                if closed_set.insert(next_state):
+                    heuristic_value = self.evaluate(next_state, current_state, action)
+                    if heuristic_value == INFINITY:
+                        continue  # No target can be reached by one of the boxes
+                    self.frontier_push(open_list, (heuristic_value, next_state))
+                    self.generated_states += 1
 
         return None
-    @print_stats
-    
+
     @print_stats
     def custom(self):
-        open_list = [(self.initial_state.get_heuristic(), self.initial_state, [])]
-        closed_set = set()  # Maintain a set of visited states
+        root_heuristic = self.evaluate(self.initial_node)
+        if root_heuristic == INFINITY:
+            return None  # A box of the root cannot reach any target
+        open_list = self.new_frontier((root_heuristic, self.initial_node))
+        closed_set = self.transposition_table  # Maintain a table of visited states
+        closed_set.insert(self.initial_node)
 
         while open_list:
-            _, current_state, path = heapq.heappop(open_list)
+            _, current_state = self.frontier_pop(open_list)
 
             if current_state.check_solved():
-                return path
+                return self.get_moves(current_state)
 
-            current_state_hash = hash(current_state)
-            if current_state_hash in closed_set:
-                continue  # Skip if state has already been visited
+            self.count_expansion(len(open_list))
 
-            closed_set.add(current_state_hash)  # Mark state as visited
-
-            for direction in ['U', 'D', 'L', 'R']:
-                next_state = current_state.move(direction)
-                next_state_hash = hash(next_state)
-
-                if next_state_hash not in closed_set:
-                    heuristic_value = next_state.get_heuristic()
-                    heapq.heappush(open_list, (heuristic_value, next_state, path + [direction]))
+            for action in self.get_legal_actions(current_state):
+                next_state = self.get_next_state(current_state, action)
 
-            self.expanded_states += 1
-            self.generated_states += 1
+                if closed_set.insert(next_state):
+                    heuristic_value = self.evaluate(next_state, current_state, action)
+                    if heuristic_value == INFINITY:
+                        continue  # No target can be reached by one of the boxes
+                    self.frontier_push(open_list, (heuristic_value, next_state))
+                    self.generated_states += 1
 
         return None
 
@@ -253,6 +557,184 @@ class Solver(object):
         
 
 
+    @print_stats
+    def bidirectional(self):
+        """Breadth-first search over pushes from the start and over pulls from the solved nodes, one whole layer of
+        the smaller frontier at a time. Both searches record their nodes in the transposition table, as a
+        [forward node, backward node] entry per state; the searches meet when one generates a node the other already
+        reached. The layer is finished so that the
+        shortest meeting is kept, then the solution is the forward pushes to the meeting node followed by the pushes
+        that undo the backward pulls."""
+        if self.initial_node.check_solved():
+            return []
+        goal_nodes = self.initial_node.get_goal_nodes()
+        frontiers = [[self.initial_node], goal_nodes]
+        reached = self.transposition_table
+        reached.record(self.initial_node, [self.initial_node, None])
+        for goal_node in goal_nodes:
+            reached.record(goal_node, [None, goal_node])
+
+        while frontiers[0] and frontiers[1]:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            next_frontier = []
+            meeting = None
+            for current_state in frontiers[side]:
+                self.count_expansion(len(frontiers[0]) + len(frontiers[1]) + len(next_frontier))
+
+                if side == 0:
+                    children = [self.get_next_state(current_state, action)
+                                for action in self.get_legal_actions(current_state)]
+                else:
+                    children = [current_state.pull(box, direction) for box, direction in current_state.get_pulls()]
+
+                for next_state in children:
+                    entry = reached.lookup(next_state)
+                    if entry is None:
+                        entry = [None, None]
+                        entry[side] = next_state
+                        reached.record(next_state, entry)
+                        next_frontier.append(next_state)
+                        self.generated_states += 1
+                    elif entry[side] is None:
+                        # The other search already reached this node: keep the shortest meeting of the layer
+                        entry[side] = next_state
+                        forward, backward = entry
+                        cost = forward.get_current_cost() + backward.get_current_cost()
+                        if meeting is None or cost < meeting[0]:
+                            meeting = (cost, forward, backward)
+
+            if meeting is not None:
+                _, forward, backward = meeting
+                pushes = []
+                while forward.parent is not None:
+                    pushes.append(forward.last_push)
+                    forward = forward.parent
+                pushes.reverse()
+                while backward.parent is not None:
+                    pushes.append(backward.last_push)
+                    backward = backward.parent
+                return self.expand_pushes(pushes)
+            frontiers[side] = next_frontier
+
+        return None
+
+    def portfolio(self):
+        """Run every configuration of the portfolio in its own process, at most `workers` at a time.
+        Without a deadline the first solution found is returned; with a deadline, the shortest solution found before
+        it. The workers still running at that point are told to stop, and send the statistics of their partial search;
+        the ones that do not within PORTFOLIO_STOP_GRACE seconds are terminated.
+        The time limit and the cancel token stop the whole portfolio; the node and memory limits apply to every
+        worker, and every worker is given the time left before the time limit."""
+        context = multiprocessing.get_context()
+        results = context.Queue()
+        pending = list(enumerate(self.portfolio_configs))
+        running = {}  # Worker index -> process
+        self.worker_stats = []
+        best = None
+        start_time = time.time()
+        deadline = None if self.deadline is None else start_time + self.deadline
+        stop_time = None if self.time_limit is None else start_time + self.time_limit
+        # The cancel token may not be picklable, so the workers get an event of their own, set to stop them all
+        stop_event = context.Event()
+        status = None
+
+        def add_stats(stats):
+            nonlocal best
+            running.pop(stats['worker']).join()
+            self.worker_stats.append(stats)
+            if stats['solution'] is not None and (best is None or len(stats['solution']) < len(best['solution'])):
+                best = stats
+
+        try:
+            while pending or running:
+                while pending and len(running) < self.workers:
+                    worker, (strategy, heuristic) = pending.pop(0)
+                    limits = {
+                        'time_limit': None if stop_time is None else max(0.0, stop_time - time.time()),
+                        'node_limit': self.node_limit,
+                        'memory_limit': self.memory_limit,
+                        'cancel_token': stop_event,
+                    }
+                    process = context.Process(
+                        target=solve_worker,
+                        args=(worker, self.initial_state, strategy, heuristic, self.memory_budget, limits, results),
+                        daemon=True,
+                    )
+                    process.start()
+                    running[worker] = process
+
+                if deadline is not None and time.time() >= deadline:
+                    status = 'time_limit'  # Unless a solution was found before the deadline
+                    break
+                if self.cancel_token is not None and self.cancel_token.is_set():
+                    status = 'cancelled'
+                    break
+                if stop_time is not None and time.time() >= stop_time:
+                    status = 'time_limit'
+                    break
+                try:
+                    stats = results.get(timeout=0.1)
+                except queue.Empty:
+                    # A worker killed from outside (e.g. out of memory) never reports back
+                    for worker, process in list(running.items()):
+                        if process.exitcode not in (None, 0):
+                            del running[worker]
+                    continue
+
+                add_stats(stats)
+                if stats['solution'] is not None and deadline is None:
+                    break
+
+            # Let the workers still running give up on their own and report how far they went
+            stop_event.set()
+            grace_time = time.time() + PORTFOLIO_STOP_GRACE
+            while running and time.time() < grace_time:
+                try:
+                    add_stats(results.get(timeout=0.1))
+                except queue.Empty:
+                    for worker, process in list(running.items()):
+                        if process.exitcode not in (None, 0):
+                            del running[worker]
+        finally:
+            for process in running.values():
+                process.terminate()
+            for process in running.values():
+                process.join()
+
+        self.expanded_states = sum(stats['expanded_states'] for stats in self.worker_stats)
+        self.generated_states = sum(stats['generated_states'] for stats in self.worker_stats)
+        if best is not None:
+            status = 'solved'
+        elif status is None:
+            # Unsolvable only if every worker proved it, otherwise report why the first worker gave up
+            gave_up = [stats['status'] for stats in self.worker_stats if stats['status'] in LIMIT_STATUSES]
+            status = gave_up[0] if gave_up else 'unsolvable'
+        self.stats = self.get_stats(None if best is None else best['solution'], time.time() - start_time, status)
+        if self.verbose:
+            for stats in self.worker_stats:
+                print("Worker:", stats['strategy'], stats['heuristic'], stats.get('error', ''))
+                report_stats(stats)
+            if best is not None:
+                print("Portfolio winner:", best['strategy'], best['heuristic'])
+
+        return None if best is None else best['solution']
+
+    def get_stats(self, result, runtime, status):
+        """Collect the statistics of a finished or abandoned search, in the shape printed by report_stats"""
+        return {
+            'strategy': self.strategy,
+            'heuristic': self.heuristic_name,
+            'solution': result,
+            'status': status,
+            'generated_states': self.generated_states,
+            'expanded_states': self.expanded_states,
+            'best_total_cost': self.best_total_cost,
+            'best_heuristic': self.best_heuristic,
+            'transposition_table': self.transposition_table.get_stats(),
+            'runtime': runtime,
+            'profile': None if self.profiler is None else self.profiler.get_stats(),
+        }
+
     def get_solution(self):
         return self.solution
 
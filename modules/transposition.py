@@ -0,0 +1,109 @@
+"""
+Transposition table shared by every solver strategy
+The table is keyed by the Zobrist hash of a SearchNode (see SearchNode.hash()). For every state it records the best
+cost g seen so far, so that:
+- bfs, dfs and greedy use it as a plain visited set (insert() returns False for a state that was seen before),
+- astar and ucs skip re-expansions that are dominated by a cheaper path to the same state,
+- idastar skips, within one iteration, states already explored with a cost at most as high,
+- bidirectional stores, with record(), the node reached by each of its two searches instead of a cost.
+Two different states can share a Zobrist hash. Every entry keeps the exact node key so collisions are detected,
+counted, and the colliding state is stored in a separate overflow dictionary.
+The memory-bounded strategies give the table a maximum number of entries. Once it is full, the oldest entry is
+evicted for every new one; forgetting a state only costs a re-expansion, never a wrong answer.
+"""
+
+
+class TranspositionTable:
+    def __init__(self, max_entries=None):
+        self.table = {}  # Zobrist hash -> [node key, best cost], in insertion order
+        self.overflow = {}  # Node key -> best cost, for states whose Zobrist hash collides
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.table) + len(self.overflow)
+
+    def __contains__(self, node):
+        return self.lookup(node) is not None
+
+    def _find(self, node):
+        """Return the entry of the node and whether it lives in the overflow dictionary"""
+        entry = self.table.get(node.hash())
+        if entry is None:
+            return None, False
+        key = node.key()
+        if entry[0] == key:
+            return entry, False
+        self.collisions += 1
+        return self.overflow.get(key), True
+
+    def lookup(self, node):
+        """Return the best cost recorded for the node, or None if the node has not been seen"""
+        entry, in_overflow = self._find(node)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry if in_overflow else entry[1]
+
+    def insert(self, node, cost=0):
+        """Record the node with the given cost.
+        Return True if the node is new or was only seen with a higher cost, False if it is dominated."""
+        entry, in_overflow = self._find(node)
+        if entry is None:
+            self.misses += 1
+            if in_overflow:
+                self.overflow[node.key()] = cost
+            else:
+                if self.max_entries is not None and len(self.table) >= self.max_entries:
+                    del self.table[next(iter(self.table))]
+                    self.evictions += 1
+                self.table[node.hash()] = [node.key(), cost]
+            return True
+
+        self.hits += 1
+        best_cost = entry if in_overflow else entry[1]
+        if cost >= best_cost:
+            return False
+        if in_overflow:
+            self.overflow[node.key()] = cost
+        else:
+            entry[1] = cost
+        return True
+
+    def record(self, node, value):
+        """Store any value for the node in place of a cost, replacing the value recorded before.
+        lookup() returns it."""
+        entry, in_overflow = self._find(node)
+        if in_overflow:
+            self.overflow[node.key()] = value
+        elif entry is not None:
+            entry[1] = value
+        else:
+            if self.max_entries is not None and len(self.table) >= self.max_entries:
+                del self.table[next(iter(self.table))]
+                self.evictions += 1
+            self.table[node.hash()] = [node.key(), value]
+
+    def clear(self):
+        """Forget every state, keeping the counters"""
+        self.table.clear()
+        self.overflow.clear()
+
+    def is_stale(self, node, cost):
+        """Check if a popped frontier entry was superseded by a cheaper path to the same node"""
+        best_cost = self.lookup(node)
+        return best_cost is not None and cost > best_cost
+
+    def get_stats(self):
+        """Get the hit, miss and collision counters of the table"""
+        return {
+            'entries': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'collisions': self.collisions,
+            'evictions': self.evictions,
+        }
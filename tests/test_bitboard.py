@@ -0,0 +1,118 @@
+"""
+Tests of the bitboard backend against GameState and SearchNode
+Random walks on the bundled maps are replayed with GameState.move and BitState.move, step by step. GameState.move
+updates its player attribute even when the move is blocked, so a blocked GameState move keeps the previous state,
+like solution_cache.replays() does.
+"""
+
+import glob
+import os
+import random
+import unittest
+
+from modules.bitboard import DIRECTIONS, BitState
+from modules.deadlock import is_freeze_deadlock
+from modules.game_state import GameState
+from modules.map_loader import load_map
+from modules.search_node import DIRECTIONS as STEPS, Layout, SearchNode
+from modules.solver import Solver
+
+MAPS_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'maps')
+MAP_PATHS = sorted(glob.glob(os.path.join(MAPS_DIRECTORY, '*.txt')))
+WALK_LENGTH = 2000
+
+
+def get_player(state):
+    """Find the player on the map of a GameState, whatever its player attribute says"""
+    for row, line in enumerate(state.map):
+        for col, char in enumerate(line):
+            if char in ['@', '+']:
+                return row, col
+    return None
+
+
+def random_walk(game_map, seed):
+    """Yield (GameState, BitState) after every step of a random walk"""
+    rng = random.Random(seed)
+    state = GameState([line[:] for line in game_map])
+    bit_state = BitState.from_state(state)
+    yield state, bit_state
+    for _ in range(WALK_LENGTH):
+        direction = rng.choice(DIRECTIONS)
+        next_state = state.move(direction)
+        if next_state.map != state.map:
+            state = next_state
+        bit_state = bit_state.move(direction)
+        yield state, bit_state
+
+
+class TestBitState(unittest.TestCase):
+    def test_move_matches_game_state(self):
+        for path in MAP_PATHS:
+            game_map = load_map(path)
+            for state, bit_state in random_walk(game_map, path):
+                layout = bit_state.layout
+                self.assertEqual(layout.get_position(bit_state.player), get_player(state), path)
+                self.assertEqual(sorted(layout.get_positions(bit_state.boxes)), sorted(state.boxes), path)
+                self.assertEqual(bit_state.get_current_cost(), state.get_current_cost(), path)
+                self.assertEqual(bit_state.check_solved(), state.check_solved(), path)
+
+    def test_pushes_match_search_node(self):
+        """Every push of SearchNode is a push of BitState; the others only lead to a freeze deadlock, which
+        BitState does not check"""
+        for path in MAP_PATHS:
+            game_map = load_map(path)
+            node_layout = Layout.from_map(game_map)
+            for index, (state, bit_state) in enumerate(random_walk(game_map, path)):
+                if index % 10:
+                    continue
+                layout = bit_state.layout
+                node = SearchNode(node_layout, get_player(state), frozenset(state.boxes))
+                node_pushes = set(node.get_pushes())
+                bit_pushes = {(layout.get_position(box), direction) for box, direction in bit_state.get_pushes()}
+                self.assertLessEqual(node_pushes, bit_pushes, path)
+                for box, direction in bit_pushes - node_pushes:
+                    d_row, d_col = STEPS[direction]
+                    new_box = (box[0] + d_row, box[1] + d_col)
+                    self.assertTrue(is_freeze_deadlock(node_layout, node.push(box, direction).boxes, new_box), path)
+
+                for box, direction in bit_state.get_pushes():
+                    pushed = bit_state.push(box, direction)
+                    node_pushed = node.push(layout.get_position(box), direction)
+                    self.assertEqual(layout.get_position(pushed.player), node_pushed.player)
+                    self.assertEqual(set(layout.get_positions(pushed.boxes)), node_pushed.boxes)
+                    self.assertEqual(pushed.check_solved(), node_pushed.check_solved())
+
+    def test_solved_check(self):
+        for path in MAP_PATHS:
+            game_map = load_map(path)
+            root = SearchNode.from_state(GameState([line[:] for line in game_map]))
+            bit_state = BitState.from_map(game_map)
+            self.assertEqual(bit_state.check_solved(), root.check_solved(), path)
+            for goal_node in root.get_goal_nodes():
+                layout = bit_state.layout
+                solved = BitState(layout, layout.get_index(goal_node.player), layout.get_mask(goal_node.boxes))
+                self.assertTrue(solved.check_solved(), path)
+
+    def test_solver_backend(self):
+        for name in ['demo.txt', 'demo3.txt', 'sokoban1.txt', 'sokoban4.txt']:
+            game_map = load_map(os.path.join(MAPS_DIRECTORY, name))
+            for strategy in ['bfs', 'dfs']:
+                solver = Solver(GameState([line[:] for line in game_map]), strategy, backend='bitboard')
+                solver.verbose = False
+                self.assertEqual(solver.solve()['status'], 'solved')
+                state = GameState([line[:] for line in game_map])
+                for direction in solver.get_solution():
+                    next_state = state.move(direction)
+                    self.assertNotEqual(next_state.map, state.map, name)
+                    state = next_state
+                self.assertTrue(state.check_solved(), name)
+
+    def test_solver_backend_rejects_informed_strategies(self):
+        game_map = load_map(os.path.join(MAPS_DIRECTORY, 'sokoban1.txt'))
+        with self.assertRaises(Exception):
+            Solver(GameState(game_map), 'astar', backend='bitboard')
+
+
+if __name__ == '__main__':
+    unittest.main()
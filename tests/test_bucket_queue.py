@@ -0,0 +1,53 @@
+"""
+Tests of the bucket queue frontier against the heap frontier
+"""
+
+import os
+import unittest
+
+from modules.game_state import GameState
+from modules.map_loader import load_map
+from modules.solver import Solver
+
+MAPS_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'maps')
+FRONTIER_STRATEGIES = ['astar', 'ucs', 'greedy', 'custom']
+
+
+def solve(name, strategy, frontier):
+    """Solve a bundled map and return the statistics and the number of pushes of the solution"""
+    game_map = load_map(os.path.join(MAPS_DIRECTORY, name))
+    solver = Solver(GameState(game_map), strategy, 'matching', frontier=frontier)
+    solver.verbose = False
+    stats = solver.solve()
+    solution = solver.get_solution()
+    if solution is None:
+        return stats, None
+    state = GameState(game_map)
+    pushes = 0
+    for direction in solution:
+        next_state = state.move(direction)
+        pushes += next_state.boxes != state.boxes
+        state = next_state
+    return stats, pushes
+
+
+class TestBucketFrontier(unittest.TestCase):
+    def test_unsolvable_root(self):
+        """A box of demo5 starts on a dead square, so the heuristic of the root is infinite"""
+        for strategy in FRONTIER_STRATEGIES:
+            for frontier in ['heap', 'bucket']:
+                stats, pushes = solve('demo5.txt', strategy, frontier)
+                self.assertEqual(stats['status'], 'unsolvable', (strategy, frontier))
+                self.assertIsNone(pushes)
+
+    def test_same_push_count_as_heap(self):
+        for name in ['demo.txt', 'demo3.txt', 'sokoban1.txt', 'sokoban4.txt']:
+            for strategy in ['astar', 'ucs']:
+                _, heap_pushes = solve(name, strategy, 'heap')
+                bucket_stats, bucket_pushes = solve(name, strategy, 'bucket')
+                self.assertEqual(bucket_stats['status'], 'solved', (name, strategy))
+                self.assertEqual(bucket_pushes, heap_pushes, (name, strategy))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+Tests of Layout.from_map on levels with parts the player cannot reach, and of the generated levels
+"""
+
+import unittest
+
+from modules.game_state import GameState
+from modules.level_generator import generate_level
+from modules.search_node import Layout
+from modules.solver import Solver
+
+# The box on a target at the top left is walled off from the player
+SOLVED_POCKET = [
+    '#########',
+    '#*#     #',
+    '###@$ . #',
+    '#########',
+]
+UNSOLVABLE_POCKET = [
+    '#########',
+    '#$#     #',
+    '#.#@$ . #',
+    '#########',
+]
+
+
+def solve(level, strategy):
+    solver = Solver(GameState([list(line) for line in level]), strategy, 'matching')
+    solver.verbose = False
+    return solver.solve()['status']
+
+
+class TestLayout(unittest.TestCase):
+    def test_box_in_pocket(self):
+        layout = Layout.from_map([list(line) for line in SOLVED_POCKET])
+        self.assertIn((1, 1), layout.floor)
+        self.assertIn((1, 1), layout.targets)
+        for strategy in ['bfs', 'astar', 'greedy', 'idastar']:
+            self.assertEqual(solve(SOLVED_POCKET, strategy), 'solved', strategy)
+            self.assertEqual(solve(UNSOLVABLE_POCKET, strategy), 'unsolvable', strategy)
+
+    def test_generated_levels_are_connected(self):
+        for seed in range(200):
+            game_map = generate_level(seed, boxes=3 + seed % 3, steps=1000)
+            cells = {(row, col) for row, line in enumerate(game_map) for col, char in enumerate(line) if char != '#'}
+            self.assertEqual(set(Layout.from_map(game_map).floor), cells, seed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Tests of the macro moves: the optimal strategies find solutions with the same number of pushes with and without them
+"""
+
+import unittest
+
+from modules.game_state import GameState
+from modules.macros import MacroMoves
+from modules.search_node import SearchNode
+from modules.solver import Solver
+
+OPTIMAL_STRATEGIES = ['astar', 'ucs', 'idastar', 'bfs', 'bidirectional']
+
+# More targets than boxes: the box must stop on the first target, not be pushed to the deepest one
+CORRIDOR = [
+    '##########',
+    '#@ $  ...#',
+    '##########',
+]
+GOAL_ROOM = [
+    '#######',
+    '#  @  #',
+    '#  $  #',
+    '#     #',
+    '### ###',
+    '  #.#  ',
+    '  #.#  ',
+    '  #.#  ',
+    '  ###  ',
+]
+# As many boxes as targets: the goal room macro applies
+FULL_GOAL_ROOM = [
+    '#######',
+    '#  @  #',
+    '# $$$ #',
+    '#     #',
+    '### ###',
+    '  #.#  ',
+    '  #.#  ',
+    '  #.#  ',
+    '  ###  ',
+]
+
+
+def count_pushes(level, strategy, macros):
+    game_map = [list(line) for line in level]
+    solver = Solver(GameState(game_map), strategy, 'matching', macros=macros)
+    solver.verbose = False
+    solver.solve()
+    state = GameState([line[:] for line in game_map])
+    pushes = 0
+    for direction in solver.get_solution():
+        next_state = state.move(direction)
+        pushes += next_state.boxes != state.boxes
+        state = next_state
+    assert state.check_solved()
+    return pushes
+
+
+class TestMacroMoves(unittest.TestCase):
+    def test_more_targets_than_boxes(self):
+        for level, pushes in [(CORRIDOR, 3), (GOAL_ROOM, 3)]:
+            root = SearchNode.from_state(GameState([list(line) for line in level]))
+            self.assertEqual(MacroMoves(root).rooms, {})
+            for strategy in OPTIMAL_STRATEGIES:
+                self.assertEqual(count_pushes(level, strategy, True), pushes, strategy)
+                self.assertEqual(count_pushes(level, strategy, False), pushes, strategy)
+
+    def test_goal_room(self):
+        root = SearchNode.from_state(GameState([list(line) for line in FULL_GOAL_ROOM]))
+        self.assertEqual(list(MacroMoves(root).rooms), [(3, 3)])
+        for strategy in ['astar', 'ucs', 'bfs']:
+            self.assertEqual(count_pushes(FULL_GOAL_ROOM, strategy, True),
+                             count_pushes(FULL_GOAL_ROOM, strategy, False), strategy)
+
+
+if __name__ == '__main__':
+    unittest.main()
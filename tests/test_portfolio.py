@@ -0,0 +1,30 @@
+"""
+Tests of the portfolio strategy
+"""
+
+import os
+import unittest
+
+from modules.game_state import GameState
+from modules.map_loader import load_map
+from modules.solver import Solver
+
+MAPS_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'maps')
+
+
+class TestPortfolio(unittest.TestCase):
+    def test_time_limit_keeps_partial_statistics(self):
+        game_map = load_map(os.path.join(MAPS_DIRECTORY, 'sokoban_extra2.txt'))
+        solver = Solver(GameState(game_map), 'portfolio', workers=2, time_limit=1,
+                        portfolio=[('bfs', 'manhattan'), ('ucs', 'manhattan')])
+        solver.verbose = False
+        stats = solver.solve()
+        self.assertEqual(stats['status'], 'time_limit')
+        self.assertEqual(len(solver.worker_stats), 2)
+        for worker_stats in solver.worker_stats:
+            self.assertGreater(worker_stats['expanded_states'], 0)
+        self.assertEqual(stats['expanded_states'], sum(worker['expanded_states'] for worker in solver.worker_stats))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+Tests of the solution cache
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from modules.game_state import GameState
+from modules.solution_cache import SolutionCache, replays
+from modules.solver import Solver
+
+# The player starts on a target, which the solution has to fill with a box
+PLAYER_ON_TARGET = [
+    '######',
+    '#+$  #',
+    '#  $.#',
+    '######',
+]
+
+
+class TestSolutionCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = SolutionCache(os.path.join(self.directory, 'cache.sqlite3'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_player_on_target(self):
+        game_map = [list(line) for line in PLAYER_ON_TARGET]
+        solver = Solver(GameState([line[:] for line in game_map]), 'astar', 'matching')
+        solver.verbose = False
+        stats = solver.solve()
+        moves = solver.get_solution()
+        self.assertTrue(replays(game_map, moves))
+
+        self.cache.put(game_map, 'astar', 'matching', moves, stats)
+        self.assertEqual(self.cache.get(game_map, 'astar', 'matching')[0], moves)
+        self.assertIsNone(self.cache.get(game_map, 'astar', 'push_distance'))
+
+    def test_wrong_solution_is_dropped(self):
+        game_map = [list(line) for line in PLAYER_ON_TARGET]
+        self.cache.put(game_map, 'astar', 'matching', ['R'], {'status': 'solved'})
+        self.assertIsNone(self.cache.get(game_map, 'astar', 'matching'))
+
+
+if __name__ == '__main__':
+    unittest.main()